@@ -0,0 +1,391 @@
+import numpy as np
+from whirlybird import *
+
+BOUNCE, STILL, MOVING, BREAKABLE, CLOUD, SPIKE, HAT = range(7)
+N_KINDS = 7
+
+PLATFORM_CLASSES = {
+    BoucePlatform: BOUNCE,
+    StillPlatform: STILL,
+    MovingPlatform: MOVING,
+    BreakablePlatform: BREAKABLE,
+    CloudPlatorm: CLOUD,
+    SpikeMovingPlatform: SPIKE,
+    Hat: HAT,
+}
+
+#rect sizes and one-shot animation data per kind, from the asset index so no sheet has to be decoded
+KIND_WIDTH = np.array([assets.frame_size(name)[0] for name in PLATFORM_SHEETS])
+KIND_HEIGHT = np.array([assets.frame_size(name)[1] for name in PLATFORM_SHEETS])
+BREAK_FRAMES, BREAK_SPEED = assets.frame_count('break'), 0.08
+CLOUD_FRAMES, CLOUD_SPEED = assets.frame_count('cloud'), 0.08
+
+PLAYER_W, PLAYER_H = assets.frame_size('player')
+
+#the game's own tables, so the parity check follows any change to them
+INITIAL_DIST = [START_DIST[difficulty] for difficulty in range(len(START_DIST))]
+INITIAL_WEIGHTS = [START_WEIGHTS[difficulty] for difficulty in range(len(START_WEIGHTS))]
+
+NO_SLOT = -1
+
+
+def round_half_away(values):
+    # pygame.Rect rounds float coordinates half away from zero
+    rounded = np.rint(values)
+    tie = np.abs(values - np.trunc(values)) == 0.5
+    return np.where(tie, np.trunc(values) + np.sign(values), rounded).astype(np.int64)
+
+
+class BatchGame:
+    def __init__(self, n_games, window_rect=None, capacity=4*N_PLATFORMS, seed=None, auto_reset=True):
+        self.n_games = n_games
+        self.capacity = capacity
+        self.window_rect = window_rect or pygame.Rect((0, 0), WINDOW_SIZE)
+        self.rng = np.random.default_rng(seed)
+        self.auto_reset = auto_reset
+
+        n, p = n_games, capacity
+
+        self.pos = np.zeros((n, 2))
+        self.speed_y = np.zeros(n)
+        self.rect_xy = np.zeros((n, 2), dtype=np.int64)
+        #player rect in world coordinates at the last collision check, and when in the last step it landed
+        self.previous_xy = np.zeros((n, 2), dtype=np.int64)
+        self.contact_time = np.full(n, np.nan)
+        self.is_boosting = np.zeros(n, dtype=bool)
+        self.time_boosting = np.zeros(n, dtype=np.int64)
+        self.falling_time = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.camera_y = np.zeros(n)
+        self.tier = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.hit_kind = np.full(n, NO_SLOT, dtype=np.int64)
+
+        self.end_pos = np.zeros((n, 2))
+        self.weights = np.zeros((n, 6))
+        self.dist = np.zeros((n, 6))
+
+        self.alive = np.zeros((n, p), dtype=bool)
+        self.kind = np.zeros((n, p), dtype=np.int64)
+        self.x = np.zeros((n, p), dtype=np.int64)
+        self.y = np.zeros((n, p), dtype=np.int64)
+        self.speedx = np.zeros((n, p), dtype=np.int64)
+        self.speedy = np.zeros((n, p))
+        #the float center y a falling spike's rect is rounded from
+        self.center_y = np.zeros((n, p))
+        self.collided = np.zeros((n, p), dtype=bool)
+        self.frame_index = np.zeros((n, p))
+        self.hat = np.full((n, p), NO_SLOT, dtype=np.int64)
+        self.lethal = np.zeros((n, p), dtype=bool)
+        self.order = np.zeros((n, p), dtype=np.int64)
+        self.next_order = np.zeros(n, dtype=np.int64)
+
+        self.rows = np.arange(n)
+        self.reset()
+
+    def reset(self, mask=None):
+        if mask is None: mask = np.ones(self.n_games, dtype=bool)
+        if not mask.any(): return
+
+        self.pos[mask] = self.window_rect.center
+        self.speed_y[mask] = 0
+        self.rect_xy[mask] = self.player_rect(self.pos[mask])
+        self.previous_xy[mask] = self.rect_xy[mask]
+        self.contact_time[mask] = np.nan
+        self.is_boosting[mask] = False
+        self.time_boosting[mask] = 0
+        self.falling_time[mask] = 0
+        self.score[mask] = 0
+        self.camera_y[mask] = 0
+        self.tier[mask] = -1
+        self.done[mask] = False
+
+        self.weights[mask] = INITIAL_WEIGHTS
+        self.dist[mask] = INITIAL_DIST
+
+        self.alive[mask] = False
+        self.hat[mask] = NO_SLOT
+        self.next_order[mask] = 1
+
+        self.end_pos[mask, 0] = self.rng.integers(0, self.window_rect.width-PLATFORM_SIZE[0], mask.sum())
+        self.end_pos[mask, 1] = self.window_rect.bottom
+
+        #platforms spawned before Game.callback is set never kill the player
+        for i in range(N_PLATFORMS):
+            self.spawn(mask, lethal=False)
+
+    def view_offset(self):
+        #Game.view_offset uses round(), which is half-to-even like np.rint
+        return np.rint(self.camera_y).astype(np.int64)
+
+    def player_rect(self, pos):
+        rect = round_half_away(pos)
+        rect[..., 0] -= PLAYER_W // 2
+        rect[..., 1] -= PLAYER_H // 2
+        return rect
+
+    def free_slots(self, rows):
+        slots = np.argmin(self.alive[rows], axis=1)
+        if self.alive[rows, slots].any(): raise OverflowError('platform capacity exceeded')
+        return slots
+
+    def place(self, rows, kinds, left, bottom):
+        slots = self.free_slots(rows)
+        self.alive[rows, slots] = True
+        self.kind[rows, slots] = kinds
+        self.x[rows, slots] = left
+        self.y[rows, slots] = bottom - KIND_HEIGHT[kinds]
+        self.center_y[rows, slots] = self.y[rows, slots] + KIND_HEIGHT[kinds] // 2
+        self.speedx[rows, slots] = np.where((kinds == MOVING) | (kinds == SPIKE), PLATFORM_SPEED, 0)
+        self.speedy[rows, slots] = 0
+        self.collided[rows, slots] = False
+        self.frame_index[rows, slots] = 0
+        self.hat[rows, slots] = NO_SLOT
+        self.lethal[rows, slots] = False
+        self.order[rows, slots] = self.next_order[rows]
+        self.next_order[rows] += 1
+        return slots
+
+    def kill(self, dead):
+        self.alive &= ~dead
+        linked = self.hat != NO_SLOT
+        lost = linked & np.take_along_axis(dead, np.where(linked, self.hat, 0), axis=1)
+        self.hat[lost] = NO_SLOT
+
+    def spawn(self, mask, lethal=True):
+        rows = np.flatnonzero(mask)
+        if not len(rows): return
+
+        cum_dist = np.cumsum(self.dist[rows], axis=1)
+        o = (self.rng.random(len(rows))[:, None] >= cum_dist).sum(axis=1)
+        #the first screen's odds add up to 0.9, rolls past the last bucket are moving platforms as in FIRST_SCREEN_DIST
+        o[o == 6] = MOVING
+        r = self.rng.random(len(rows))
+
+        left = self.end_pos[rows, 0].astype(np.int64)
+        bottom = round_half_away(self.end_pos[rows, 1])
+        slots = self.place(rows, o, left, bottom)
+        self.lethal[rows, slots] = lethal & (o == SPIKE)
+
+        with_hat = ((o == STILL) | (o == MOVING)) & (r > 0.9)
+        if with_hat.any():
+            hrows, hslots = rows[with_hat], slots[with_hat]
+            kinds = o[with_hat]
+            centerx = self.x[hrows, hslots] + KIND_WIDTH[kinds] // 2
+            centery = self.y[hrows, hslots] + KIND_HEIGHT[kinds] // 2 - 10
+            hat_slots = self.place(hrows, np.full(len(hrows), HAT),
+                                   centerx - KIND_WIDTH[HAT] // 2,
+                                   centery - KIND_HEIGHT[HAT] // 2 + KIND_HEIGHT[HAT])
+            linked = kinds == MOVING
+            self.hat[hrows[linked], hslots[linked]] = hat_slots[linked]
+
+        self.end_pos[rows, 0] = self.rng.integers(0, self.window_rect.width-PLATFORM_SIZE[0], len(rows))
+        self.end_pos[rows, 1] -= PLATFORM_SPACING
+
+    def spawn_counts(self, counts):
+        while counts.any():
+            pending = counts > 0
+            self.spawn(pending)
+            counts[pending] -= 1
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        self.hit_kind[:] = NO_SLOT
+
+        self.update_player(actions)
+        self.update_platforms()
+        died = self.check_collision()
+        scored = self.check_vertical_scroll()
+        self.manage_platforms()
+        self.update_distribution()
+        died |= self.falling_time > 150
+
+        self.done |= died
+        if self.auto_reset: self.reset(self.done)
+        return scored, died
+
+    def update_player(self, actions):
+        self.pos[:, 0] += np.where(actions == MOVE_RIGHT, SPEED_INCREASE,
+                                   np.where(actions == MOVE_LEFT, -SPEED_INCREASE, 0))
+
+        boosting = self.is_boosting
+        expired = boosting & (self.time_boosting > BOOST_TIMEOUT)
+        self.speed_y = np.where(boosting, np.where(expired, 0, -JUMP_IMPULSE), self.speed_y + GRAVITY)
+        self.time_boosting = np.where(expired, 0, self.time_boosting + boosting)
+        self.is_boosting = boosting & ~expired
+
+        self.speed_y = np.minimum(self.speed_y, 10)
+        self.pos[:, 1] += self.speed_y
+
+        self.falling_time = np.where(self.speed_y > 0, self.falling_time + 1, 0)
+
+        x = self.pos[:, 0]
+        self.pos[:, 0] = np.where(x < 0, self.window_rect.right, np.where(x > self.window_rect.right, 0, x))
+        self.rect_xy = self.player_rect(self.pos)
+
+    def update_platforms(self):
+        alive, kind, collided = self.alive, self.kind, self.collided
+        widths = KIND_WIDTH[kind]
+
+        sliding = alive & ((kind == MOVING) | ((kind == SPIKE) & ~collided))
+        self.x += np.where(sliding, self.speedx, 0)
+
+        #MovingPlatform drags its hat before bouncing off the walls
+        carries = sliding & (kind == MOVING) & (self.hat != NO_SLOT)
+        if carries.any():
+            rows, slots = np.nonzero(carries)
+            hats = self.hat[rows, slots]
+            centerx = self.x[rows, slots] + KIND_WIDTH[MOVING] // 2
+            self.x[rows, hats] = centerx - KIND_WIDTH[HAT] // 2
+
+        right = self.window_rect.right
+        left = self.window_rect.left
+        over_right = sliding & (self.x + widths > right)
+        over_left = sliding & ~over_right & (self.x < left)
+        self.x = np.where(over_right, right - widths, np.where(over_left, left, self.x))
+        self.speedx = np.where(over_right | over_left, -self.speedx, self.speedx)
+
+        falling = alive & (kind == SPIKE) & collided
+        if falling.any():
+            self.speedy = np.where(falling, self.speedy + GRAVITY, self.speedy)
+            self.x += np.where(falling, self.speedx, 0)
+            self.center_y = np.where(falling, self.center_y + self.speedy, self.center_y)
+            self.y = np.where(falling, round_half_away(self.center_y) - KIND_HEIGHT[SPIKE] // 2, self.y)
+
+        self.update_one_shot(BREAKABLE, BREAK_FRAMES, BREAK_SPEED)
+        self.update_one_shot(CLOUD, CLOUD_FRAMES, CLOUD_SPEED)
+
+    def update_one_shot(self, kind, n_frames, frame_speed):
+        active = self.alive & (self.kind == kind) & self.collided
+        if not active.any(): return
+        playing = active & (self.frame_index < n_frames - 1)
+        index = self.frame_index + frame_speed
+        index = np.where(index >= n_frames, index % n_frames, index)
+        self.frame_index = np.where(playing, index, self.frame_index)
+        self.kill(active & ~playing)
+
+    def check_collision(self):
+        died = np.zeros(self.n_games, dtype=bool)
+
+        px, py = self.rect_xy[:, 0:1], self.rect_xy[:, 1:2] + self.view_offset()[:, None]
+        sx, sy = self.previous_xy[:, 0:1].copy(), self.previous_xy[:, 1:2].copy()
+        self.previous_xy[:, 0:1], self.previous_xy[:, 1:2] = px, py
+        #wrapping around the screen edge is a jump, not motion to sweep
+        sx = np.where(np.abs(px - sx) > self.window_rect.width / 2, px, sx)
+
+        width, height = KIND_WIDTH[self.kind], KIND_HEIGHT[self.kind]
+        overlap = self.alive \
+            & (px < self.x + width) & (px + PLAYER_W > self.x) \
+            & (py < self.y + height) & (py + PLAYER_H > self.y)
+
+        #the player's bottom edge crossing a top edge during the step, at the x it had by then
+        bottom, previous_bottom = py + PLAYER_H, sy + PLAYER_H
+        crossing = self.alive & (previous_bottom <= self.y) & (self.y < bottom)
+        t = (self.y - previous_bottom) / np.maximum(bottom - previous_bottom, 1)
+        x = sx + (px - sx) * t
+        crossing &= (x < self.x + width) & (x + PLAYER_W > self.x)
+
+        #PlatformGroup.sweep: the earliest contact, an overlap at the end counts as 1, ties go to the earliest added
+        contact = np.where(crossing, t, np.where(overlap, 1.0, np.inf))
+        earliest = contact.min(axis=1)
+        first = np.argmin(np.where(contact == earliest[:, None], self.order, np.iinfo(np.int64).max), axis=1)
+        hit = np.isfinite(earliest) & (self.speed_y > 0)
+        self.contact_time = np.where(hit, earliest, np.nan)
+        if not hit.any(): return died
+
+        rows, slots = np.flatnonzero(hit), first[hit]
+        kinds = self.kind[rows, slots]
+        was_collided = self.collided[rows, slots]
+        self.hit_kind[rows] = kinds
+
+        jump = (kinds == STILL) | (kinds == MOVING) | ((kinds == BREAKABLE) & ~was_collided)
+
+        spike = kinds == SPIKE
+        lethal = spike & (self.rng.random(len(rows)) > 0.9) & self.lethal[rows, slots]
+        died[rows[lethal]] = True
+        jump |= spike & ~lethal
+
+        self.speed_y[rows[jump]] = -JUMP_IMPULSE
+        self.speed_y[rows[kinds == BOUNCE]] = -JUMP_IMPULSE * 2
+
+        hat = kinds == HAT
+        self.is_boosting[rows[hat]] = True
+        killed = np.zeros_like(self.alive)
+        killed[rows[hat], slots[hat]] = True
+        self.kill(killed)
+
+        sets_collided = (kinds == BOUNCE) | (kinds == BREAKABLE) | (kinds == CLOUD) | spike
+        self.collided[rows[sets_collided], slots[sets_collided]] = True
+
+        breaks = (kinds == BREAKABLE) & ~was_collided
+        self.spawn(np.isin(self.rows, rows[breaks]))
+
+        return died
+
+    def check_vertical_scroll(self):
+        y = self.pos[:, 1]
+        up = y < MIN_PLAYER_Y
+        down = ~up & (y > MAX_PLAYER_Y)
+        scrolling = up | down
+
+        self.pos[:, 1] = np.where(up, MIN_PLAYER_Y, np.where(down, MAX_PLAYER_Y, y))
+        self.camera_y -= np.where(scrolling, -self.speed_y, 0)
+        self.score += up * SCORE_UPDATE
+        return up * SCORE_UPDATE
+
+    def manage_platforms(self):
+        gone = self.alive & (self.y >= (self.window_rect.bottom + self.view_offset())[:, None])
+        if not gone.any(): return
+        self.kill(gone)
+        self.spawn_counts(gone.sum(axis=1))
+
+    def update_distribution(self):
+        tier = self.score // DIFFICULTY_STEP
+        changed = tier != self.tier
+        if not changed.any(): return
+        self.tier[changed] = tier[changed]
+        self.weights[changed] += tier[changed, None] * np.arange(6)
+        self.dist[changed] = self.weights[changed] / self.weights[changed].sum(axis=1, keepdims=True)
+
+    def load_game(self, i, game):
+        player = game.player.sprite
+        self.pos[i] = player.pos
+        self.speed_y[i] = player.speed.y
+        self.rect_xy[i] = player.rect.topleft
+        self.previous_xy[i] = game.previous_rect.topleft
+        self.is_boosting[i] = player.is_boosting
+        self.time_boosting[i] = player.time_boosting
+        self.falling_time[i] = player.falling_time
+        self.score[i] = game.score
+        self.camera_y[i] = game.camera_y
+        self.tier[i] = -1 if game.tier is None else game.tier
+        self.done[i] = False
+
+        self.end_pos[i] = game.end_pos
+        self.weights[i] = [game.weights[d] for d in range(6)]
+        self.dist[i] = [game.dist[d] for d in range(6)]
+
+        self.alive[i] = False
+        self.hat[i] = NO_SLOT
+        slots = {}
+        for slot, platform in enumerate(game.platforms.sprites()):
+            slots[platform] = slot
+            self.alive[i, slot] = True
+            self.kind[i, slot] = PLATFORM_CLASSES[type(platform)]
+            self.x[i, slot], self.y[i, slot] = platform.rect.topleft
+            self.speedx[i, slot] = getattr(platform, 'speedx', 0)
+            self.speedy[i, slot] = getattr(platform, 'speedy', 0)
+            self.center_y[i, slot] = platform.pos.y if hasattr(platform, 'pos') else platform.rect.centery
+            self.collided[i, slot] = getattr(platform, 'collided', False)
+            animation = getattr(platform, 'animation', None)
+            self.frame_index[i, slot] = animation.frame_index if animation else 0
+            self.order[i, slot] = slot + 1
+            if isinstance(platform, SpikeMovingPlatform):
+                self.lethal[i, slot] = platform.callbacks['spike_out'] is not None
+        self.next_order[i] = len(slots) + 1
+
+        for platform, slot in slots.items():
+            hat = getattr(platform, 'hat', None)
+            if hat in slots: self.hat[i, slot] = slots[hat]
+
+        return slots
@@ -0,0 +1,67 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse, subprocess, sys, tempfile, time
+
+from bundle import build_bundle
+from utils import AssetManager
+from whirlybird import assets
+
+#each script prints the seconds from just before importing the game to the end of its loading
+STARTUP = '''import time; start = time.perf_counter()
+import whirlybird
+whirlybird.assets.bundle_path = %r
+if %r:
+    for frames in whirlybird.assets.frames.values(): frames.load()
+if %r: whirlybird.Engine(whirlybird.WINDOW_SIZE)
+print(time.perf_counter() - start)'''
+
+
+def startup(bundle_path, decode, repeat, engine=False):
+    #a fresh interpreter per run, the fastest run is the least noisy
+    script = STARTUP % (bundle_path, decode, engine)
+    return min(float(subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout)
+               for i in range(repeat)) * 1e3
+
+
+def first_use(bundle_path, repeat):
+    #decoding every sheet once in a new registry, as the first frame of each animation does
+    best = None
+    for i in range(repeat):
+        registry = AssetManager(bundle_path=bundle_path)
+        for name, source in assets.sources.items(): registry.load(name, *source)
+        start = time.perf_counter()
+        for frames in registry.frames.values(): frames.load()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best: best = elapsed
+    return best / len(assets.sources) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup cost of the png loader against the lazy asset bundle')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sprites.bundle')
+        build_bundle(assets.sources, path)
+        print('bundle: %d sheets, %d bytes' % (len(assets.sources), os.path.getsize(path)))
+
+        print('%-34s %10s' % ('import whirlybird', 'ms'))
+        print('%-34s %10.2f' % ('decoding every png (old loader)', startup(None, True, args.repeat)))
+        print('%-34s %10.2f' % ('decoding every sheet from bundle', startup(path, True, args.repeat)))
+        print('%-34s %10.2f' % ('lazy, nothing decoded', startup(path, False, args.repeat)))
+
+        #Engine lays out the sprite atlas, which only needs the sizes in the bundle index
+        print('%-34s %10s' % ('import and Engine()', 'ms'))
+        print('%-34s %10.2f' % ('png', startup(None, False, args.repeat, True)))
+        print('%-34s %10.2f' % ('bundle', startup(path, False, args.repeat, True)))
+
+        print('%-34s %10s' % ('first use', 'ms/sheet'))
+        print('%-34s %10.3f' % ('png', first_use(None, args.repeat)))
+        print('%-34s %10.3f' % ('bundle', first_use(path, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import argparse, time
+
+from batch import *
+from headless import RandomInput
+
+
+class FreshPool(PlatformPool):
+    #recycled sprites would look alive to the slot comparison below
+    def release(self, platform): pass
+
+
+def dispose(game):
+    game.exit()
+    game.dispose()
+
+
+def check_parity(n_steps, seed):
+    random.seed(seed)
+    batch = BatchGame(1, seed=seed, auto_reset=False)
+    window_rect = batch.window_rect
+    source = RandomInput(seed)
+    action = [NO_ACTION]
+    dead = [False]
+
+    def new_game(old=None):
+        #the finished game's level worker stops here instead of whenever it is collected
+        if old is not None: dispose(old)
+        game = Game(window_rect, lambda: action[0], pool=FreshPool())
+        game.callback = lambda: dead.__setitem__(0, True)
+        dead[0] = False
+        return game
+
+    game = new_game()
+    mismatches = []
+    for step in range(n_steps):
+        action[0] = source()
+        slots = batch.load_game(0, game)
+
+        batch.step([action[0]])
+        game.update(1/60)
+
+        player = game.player.sprite
+        expected = {
+            'pos': tuple(player.pos),
+            'speed_y': player.speed.y,
+            'rect': player.rect.topleft,
+            'is_boosting': player.is_boosting,
+            'time_boosting': player.time_boosting,
+            'falling_time': player.falling_time,
+            'score': game.score,
+            'end_y': game.end_pos.y,
+            'camera_y': game.camera_y,
+        }
+        actual = {
+            'pos': tuple(batch.pos[0]),
+            'speed_y': batch.speed_y[0],
+            'rect': tuple(batch.rect_xy[0]),
+            'is_boosting': batch.is_boosting[0],
+            'time_boosting': batch.time_boosting[0],
+            'falling_time': batch.falling_time[0],
+            'score': batch.score[0],
+            'end_y': batch.end_pos[0, 1],
+            'camera_y': batch.camera_y[0],
+        }
+        #spike outcomes come from different random streams
+        if batch.hit_kind[0] == SPIKE:
+            for key in ('pos', 'speed_y', 'rect', 'camera_y'): del expected[key]
+
+        for key in expected:
+            if expected[key] != actual[key]: mismatches.append((step, key, expected[key], actual[key]))
+
+        for platform, slot in slots.items():
+            alive = platform.alive()
+            #a freed slot may already hold a platform spawned this step
+            reused = batch.order[0, slot] != slot + 1
+            if alive != (batch.alive[0, slot] and not reused):
+                mismatches.append((step, 'alive', type(platform).__name__, alive))
+            elif alive and platform.rect.topleft != (batch.x[0, slot], batch.y[0, slot]) \
+                    and batch.hit_kind[0] != SPIKE:
+                mismatches.append((step, 'rect', platform.rect.topleft, (batch.x[0, slot], batch.y[0, slot])))
+
+        if not np.allclose([game.dist[d] for d in range(6)], batch.dist[0]):
+            mismatches.append((step, 'dist', game.dist, batch.dist[0]))
+
+        if dead[0]: game = new_game(game)
+
+    dispose(game)
+    return mismatches
+
+
+def throughput(n_games, n_steps, seed):
+    batch = BatchGame(n_games, seed=seed)
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(0, 3, (n_steps, n_games))
+
+    start = time.perf_counter()
+    for step in range(n_steps):
+        batch.step(actions[step])
+    return n_steps * n_games / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BatchGame parity check and throughput')
+    parser.add_argument('--parity-steps', type=int, default=5000)
+    parser.add_argument('--games', type=int, nargs='+', default=[1, 64, 256, 1024])
+    parser.add_argument('--steps', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    mismatches = check_parity(args.parity_steps, args.seed)
+    for mismatch in mismatches[:20]: print('mismatch at step %d: %s expected %r got %r' % mismatch)
+    print('parity: %s (%d steps)' % ('FAIL' if mismatches else 'ok', args.parity_steps))
+
+    for n_games in args.games:
+        print('%5d games: %10.0f game steps/sec' % (n_games, throughput(n_games, args.steps, args.seed)))
+
+    if mismatches: raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import argparse, os, time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from headless import *
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def scripted_run(dirty_rects, n_frames, seed):
+    random.seed(seed)
+    engine = Engine(WINDOW_SIZE)
+    manager = GameManager(engine.window_rect, ScriptedInput([NO_ACTION]*30 + [MOVE_RIGHT]*20 + [MOVE_LEFT]*25), dirty_rects)
+    manager.on_start()
+
+    frame_times = []
+    full_frames = 0
+    pixels = 0
+    for frame in range(n_frames):
+        manager.update(engine.dt)
+        if not manager.is_playing: manager.on_start()
+
+        start = time.perf_counter()
+        rects = manager.draw(engine.screen)
+        engine.present(rects)
+        frame_times.append(time.perf_counter() - start)
+
+        if rects is None:
+            full_frames += 1
+            pixels += engine.window_rect.width * engine.window_rect.height
+        else: pixels += sum(rect.width * rect.height for rect in rects)
+
+    return frame_times, full_frames, pixels
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Full flip vs dirty-rect frame times on a scripted run')
+    parser.add_argument('--frames', type=int, default=3000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for label, dirty_rects in (('full flip', False), ('dirty rects', True)):
+        frame_times, full_frames, pixels = scripted_run(dirty_rects, args.frames, args.seed)
+        print('%-12s mean %.3f ms  p95 %.3f ms  full redraws %5.1f%%  pixels/frame %d' % (
+            label, 1000 * sum(frame_times) / len(frame_times), 1000 * percentile(frame_times, 95),
+            100 * full_frames / args.frames, pixels // args.frames))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+import argparse
+
+from headless import *
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless Game.update throughput')
+    parser.add_argument('--steps', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    engine = HeadlessEngine(WINDOW_SIZE)
+    engine.scene = Session(engine.window_rect, RandomInput(args.seed))
+
+    steps, elapsed = engine.run(max_steps=args.steps)
+    engine.scene.close()
+    simulated = steps * engine.dt
+
+    print('steps:            %d' % steps)
+    print('wall time:        %.3f s' % elapsed)
+    print('steps/sec:        %.0f' % (steps / elapsed))
+    print('simulated s/sec:  %.1f' % (simulated / elapsed))
+    print('episodes:         %d (best score %d)' % (engine.scene.episodes, engine.scene.high_score))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import argparse, multiprocessing, os, tempfile
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from headless import *
+
+
+def session(idle_wait, seconds, seed):
+    #the start menu, a scripted game until it ends or time is up, then the game over screen, each for about as long
+    random.seed(seed)
+    #built as whirlybird's main does, so the frame cap and idle waiting are the shipped defaults
+    engine = Engine(WINDOW_SIZE, scale=WINDOW_SCALE, scale_mode=SCALE_MODE, pipelined=PIPELINED)
+    if not idle_wait: engine.idle_wait = None
+    with tempfile.TemporaryDirectory() as directory:
+        scores = ScoreStore(os.path.join(directory, 'high_score.txt'), os.path.join(directory, 'leaderboard.json'))
+        manager = engine.scene = GameManager(engine.window_rect, ScriptedInput([NO_ACTION]*30 + [MOVE_RIGHT]*20 + [MOVE_LEFT]*25),
+                                             score_store=scores)
+
+        start_game, end_game = engine.event_system.add_event(), engine.event_system.add_event()
+        engine.event_system.subscribe(lambda event: manager.on_start(), start_game)
+        engine.event_system.subscribe(lambda event: manager.is_playing and manager.on_player_death(), end_game)
+        pygame.time.set_timer(start_game, int(1000 * seconds), loops=1)
+        pygame.time.set_timer(end_game, int(2000 * seconds), loops=1)
+        pygame.time.set_timer(pygame.QUIT, int(3000 * seconds), loops=1)
+
+        engine.mainloop()
+        scores.close()
+    return dict(engine.usage)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CPU use and frames drawn in menus and gameplay, with and without idle waiting')
+    parser.add_argument('--seconds', type=float, default=3, help='time on the start menu, longest time playing and time on the game over screen')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    #every run gets a fresh interpreter since Engine.mainloop ends with pygame.quit
+    context = multiprocessing.get_context('spawn')
+    for label, idle_wait in (('redraw always', False), ('idle aware', True)):
+        with context.Pool(1) as pool: usage = pool.apply(session, (idle_wait, args.seconds, args.seed))
+        print('%-14s' % label + '   '.join('%s %5.1f%% cpu %5.1f fps' % (mode, 100 * cpu / wall, frames / wall)
+                                           for mode, (cpu, wall, frames) in sorted(usage.items())))
+
+
+if __name__ == '__main__':
+    main()
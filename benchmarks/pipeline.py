@@ -0,0 +1,93 @@
+import argparse, multiprocessing, os, tempfile, threading, time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from headless import *
+from benchmarks.pools import revive
+
+
+def session(pipelined, seconds, seed, scale, scale_mode, max_fps, dirty_rects, key_interval):
+    #a game that never ends, with a key press posted at a steady rate to time until it is on screen
+    random.seed(seed)
+    engine = Engine(WINDOW_SIZE, max_fps=max_fps, scale=scale, scale_mode=scale_mode, pipelined=pipelined)
+    directory = tempfile.TemporaryDirectory()
+    scores = ScoreStore(os.path.join(directory.name, 'high_score.txt'), os.path.join(directory.name, 'leaderboard.json'))
+    manager = engine.scene = GameManager(engine.window_rect, RandomInput(seed), dirty_rects=dirty_rects, score_store=scores)
+    manager.on_start()
+    game = manager.current_scene
+    game.callback = lambda: revive(game)
+
+    def press():
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            time.sleep(key_interval)
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_F12, mod=0, unicode='', scancode=0))
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    threading.Thread(target=press, daemon=True).start()
+    start = time.perf_counter()
+    engine.mainloop()
+    elapsed = time.perf_counter() - start
+    scores.close()
+    directory.cleanup()
+    return {'fps': engine.presented / elapsed, 'latency': engine.latency_stats(), 'replaced': engine.replaced,
+            'cpu': {mode: cpu / wall for mode, (cpu, wall, frames) in engine.usage.items() if wall}}
+
+
+def check_replacement(ticks, seed):
+    #whole frames are left waiting so the frame after them replaces them, every frame shown must still match the
+    #same game drawn straight to a surface
+    engine = Engine(WINDOW_SIZE)
+    recorded, direct = (Game(engine.window_rect, RandomInput(seed), dirty_rects=True, seed=seed) for i in range(2))
+    recorder = DrawRecorder(engine.window_rect.size)
+    frames = FrameBuffer(0)
+    expected = pygame.Surface(engine.window_rect.size)
+    replaced = stale = 0
+    try:
+        for tick in range(ticks):
+            recorded.update(engine.dt)
+            direct.update(engine.dt)
+            direct.draw(expected)
+            rects = recorded.draw(recorder)
+            if frames.pending is not None and rects is not None: replaced += 1
+            frames.put(Frame(recorder.take(), rects and [pygame.Rect(rect) for rect in rects], time.perf_counter(), None))
+            if rects is None: continue
+            replay(engine.screen, frames.take(0).ops)
+            stale += pygame.image.tobytes(engine.screen, 'RGB') != pygame.image.tobytes(expected, 'RGB')
+    finally:
+        recorded.dispose()
+        direct.dispose()
+        pygame.quit()
+    return stale, replaced
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Frame rate and input to photon latency of the single threaded and pipelined loops')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scale', type=int, default=2, help='window scale, scaling is the work a flip does')
+    parser.add_argument('--scale-mode', default=SCALE_SMOOTH, choices=(SCALE_NEAREST, SCALE_SMOOTH, SCALE_PRESCALED))
+    parser.add_argument('--max-fps', type=int, default=0)
+    parser.add_argument('--dirty-rects', action='store_true')
+    parser.add_argument('--check-ticks', type=int, default=600, help='ticks of the whole frame replacement check')
+    parser.add_argument('--key-interval', type=float, default=0.1, help='seconds between posted key presses')
+    args = parser.parse_args()
+
+    print('%d cores, %gx %s scaling' % (os.cpu_count(), args.scale, args.scale_mode))
+    #every run gets a fresh interpreter since Engine.mainloop ends with pygame.quit
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool: stale, replaced = pool.apply(check_replacement, (args.check_ticks, args.seed))
+    print('replacement: %s (%d whole frames replaced by dirty rect ones, %d frames shown stale)' % (
+        'STALE' if stale else 'ok', replaced, stale))
+    print('%-16s %8s %10s %10s %10s %9s' % ('loop', 'fps', 'mean ms', 'p50 ms', 'p95 ms', 'replaced'))
+    for label, pipelined in (('single threaded', False), ('pipelined', True)):
+        with context.Pool(1) as pool:
+            result = pool.apply(session, (pipelined, args.seconds, args.seed, args.scale, args.scale_mode, args.max_fps,
+                                          args.dirty_rects, args.key_interval))
+        mean, p50, p95 = result['latency'] or (0, 0, 0)
+        print('%-16s %8.1f %10.2f %10.2f %10.2f %9d' % (label, result['fps'], mean * 1e3, p50 * 1e3, p95 * 1e3,
+                                                       result['replaced']))
+
+
+if __name__ == '__main__':
+    main()
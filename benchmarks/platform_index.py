@@ -0,0 +1,63 @@
+import argparse, time
+
+import whirlybird
+from headless import *
+
+
+def linear_collide(game):
+    rect = game.player_world_rect()
+    for platform in game.platforms:
+        if rect.colliderect(platform.rect): return platform
+
+def linear_below(game):
+    bottom = game.window_rect.bottom + game.view_offset()
+    return [platform for platform in game.platforms.sprites() if platform.rect.y >= bottom]
+
+def indexed_collide(game):
+    return game.platforms.collide(game.player_world_rect())
+
+def indexed_below(game):
+    return game.platforms.below(game.window_rect.bottom + game.view_offset())
+
+
+def sweep(n_platforms, n_steps, seed):
+    whirlybird.N_PLATFORMS = n_platforms
+    random.seed(seed)
+    engine = HeadlessEngine(WINDOW_SIZE)
+    session = Session(engine.window_rect, RandomInput(seed))
+
+    timings = {'linear': 0, 'indexed': 0}
+    for step in range(n_steps):
+        session.update(engine.dt)
+        game = session.game
+
+        start = time.perf_counter()
+        expected = linear_collide(game), len(linear_below(game))
+        timings['linear'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = indexed_collide(game), len(indexed_below(game))
+        timings['indexed'] += time.perf_counter() - start
+
+        if expected != actual: raise AssertionError('index disagrees with linear scan at step %d' % step)
+    session.close()
+
+    return {label: 1e6 * total / n_steps for label, total in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Collision and culling cost as N_PLATFORMS grows')
+    parser.add_argument('--platforms', type=int, nargs='+', default=[20, 100, 500, 1000, 5000, 10000])
+    parser.add_argument('--steps', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('%8s %14s %14s %8s' % ('N', 'linear us', 'indexed us', 'speedup'))
+    for n_platforms in args.platforms:
+        result = sweep(n_platforms, args.steps, args.seed)
+        print('%8d %14.2f %14.2f %7.1fx' % (n_platforms, result['linear'], result['indexed'],
+                                            result['linear'] / result['indexed']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import argparse
+
+from headless import *
+
+
+def revive(game):
+    player = game.player.sprite
+    player.falling_time = 0
+    player.pos.y = MIN_PLAYER_Y
+    if not player.is_boosting:
+        game.add_player_hat()
+        player.boost()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Platform pool allocations during one long game')
+    parser.add_argument('--warmup', type=int, default=20000)
+    parser.add_argument('--steps', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reserve', type=int, default=2*N_PLATFORMS,
+                        help='instances of each platform type to preallocate')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    engine = HeadlessEngine(WINDOW_SIZE)
+    pool = PlatformPool()
+    position = (0, 0)
+    for platform_type in (StillPlatform, BreakablePlatform, CloudPlatorm, BoucePlatform, Hat):
+        pool.reserve(platform_type, args.reserve, position)
+    for platform_type in (MovingPlatform, SpikeMovingPlatform):
+        pool.reserve(platform_type, args.reserve, engine.window_rect, position)
+
+    game = Game(engine.window_rect, RandomInput(args.seed), pool=pool)
+    #boosting the player back up instead of ending the run keeps platforms scrolling off forever
+    game.callback = lambda: revive(game)
+
+    engine.scene = game
+    engine.run(max_steps=args.warmup)
+    created, reused = sum(pool.created.values()), sum(pool.reused.values())
+    engine.run(max_steps=args.steps)
+    steady_created = sum(pool.created.values()) - created
+    steady_reused = sum(pool.reused.values()) - reused
+
+    print('%-22s %8s %8s' % ('type', 'created', 'reused'))
+    for platform_type in sorted(pool.created, key=lambda t: t.__name__):
+        print('%-22s %8d %8d' % (platform_type.__name__, pool.created[platform_type], pool.reused[platform_type]))
+    print('steady state: %d recycled, %d allocated (%.4f per recycled platform), score %d' % (
+        steady_reused, steady_created, steady_created / max(steady_reused, 1), game.score))
+
+
+if __name__ == '__main__':
+    main()
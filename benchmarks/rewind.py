@@ -0,0 +1,66 @@
+import argparse, time
+
+from headless import *
+from benchmarks.pools import revive
+
+
+def percentile(samples, q):
+    return sorted(samples)[int(q * (len(samples) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Save state and restore cost of the practice mode rewind')
+    parser.add_argument('--warmup', type=int, default=5000)
+    parser.add_argument('--seconds', type=int, default=REWIND_SECONDS)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    engine = HeadlessEngine(WINDOW_SIZE)
+    rng = random.Random(args.seed)
+    ticks = args.seconds * TICK_RATE
+    input_source = ScriptedInput(rng.choice((NO_ACTION, MOVE_LEFT, MOVE_RIGHT)) for i in range(args.warmup + ticks))
+    game = Game(engine.window_rect, input_source, seed=args.seed)
+    game.callback = lambda: revive(game)
+    for i in range(args.warmup): game.update(1 / TICK_RATE)
+
+    buffer = RewindBuffer(ticks)
+    indices = []
+    update_times, save_times, sizes = [], [], []
+    for i in range(ticks):
+        start = time.perf_counter()
+        game.update(1 / TICK_RATE)
+        saved = time.perf_counter()
+        state = game.save_state()
+        buffer.push(state)
+        update_times.append(saved - start)
+        save_times.append(time.perf_counter() - saved)
+        sizes.append(len(state))
+        indices.append(input_source.index)
+    final = bytes(game.save_state())
+
+    load_times = []
+    while len(buffer):
+        state = buffer.pop()
+        start = time.perf_counter()
+        game.load_state(state)
+        load_times.append(time.perf_counter() - start)
+
+    #playing the same inputs forward from the oldest state has to land on the same final state
+    input_source.index = indices[0]
+    for i in range(ticks - 1): game.update(1 / TICK_RATE)
+    print('restore: %s (%d ticks rewound and replayed)' % ('ok' if bytes(game.save_state()) == final else 'MISMATCH', ticks))
+
+    print('%-10s %10s %10s' % ('per tick', 'mean us', 'p99 us'))
+    for name, samples in (('update', update_times), ('snapshot', save_times), ('restore', load_times)):
+        print('%-10s %10.1f %10.1f' % (name, sum(samples) / len(samples) * 1e6, percentile(samples, 0.99) * 1e6))
+
+    mean_size = sum(sizes) / len(sizes)
+    print('state: %.0f bytes mean, %d max, %d platforms at the end' % (mean_size, max(sizes), len(game.platforms)))
+    print('history: %.1f KB/s packed, %.1f KB/s in %d byte slots, %.1f MB ring for %d s' % (
+        mean_size * TICK_RATE / 1024, buffer.slot_size * TICK_RATE / 1024, buffer.slot_size,
+        buffer.nbytes / 2**20, args.seconds))
+    if buffer.overflows: print('%d states did not fit a slot' % buffer.overflows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import argparse, random, time
+
+from utils import outcome, normalize
+from sampler import AliasTable
+
+WEIGHTS = {0: 20, 1: 15, 2: 10, 3: 5, 4: 4, 5: 1}
+
+
+def timed(fn, n):
+    start = time.perf_counter()
+    fn(n)
+    return (time.perf_counter() - start) / n * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Platform type sampling: linear scan vs alias table')
+    parser.add_argument('--draws', type=int, default=500000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    dist = normalize(WEIGHTS)
+    table = AliasTable(WEIGHTS)
+
+    def scan(n):
+        for i in range(n): outcome(dist, rng)
+
+    def alias(n):
+        for i in range(n): table.sample(rng)
+
+    def renormalize(n):
+        for i in range(n): normalize(WEIGHTS)
+
+    def rebuild(n):
+        for i in range(n): AliasTable(WEIGHTS)
+
+    print('outcome():          %7.1f ns/draw' % timed(scan, args.draws))
+    print('AliasTable.sample:  %7.1f ns/draw' % timed(alias, args.draws))
+    print('normalize():        %7.1f ns/call' % timed(renormalize, args.draws // 10))
+    print('AliasTable():       %7.1f ns/build' % timed(rebuild, args.draws // 10))
+
+    #the drawn frequencies must match the weights either way
+    counts = [0] * len(WEIGHTS)
+    for i in range(args.draws): counts[table.sample(rng)] += 1
+    error = max(abs(counts[k] / args.draws - p) for k, p in dist.items())
+    print('max frequency error: %.4f' % error)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import argparse, os, time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from headless import *
+
+
+def scripted_run(scale, scale_mode, dirty_rects, n_frames, seed):
+    random.seed(seed)
+    engine = Engine(WINDOW_SIZE, scale=scale, scale_mode=scale_mode)
+    game = Game(engine.window_rect, ScriptedInput([NO_ACTION]*30 + [MOVE_RIGHT]*20 + [MOVE_LEFT]*25), dirty_rects, seed=seed)
+
+    frame_times = []
+    for frame in range(n_frames):
+        game.update(engine.dt)
+        if game.player.sprite.falling_time > 150:
+            game.exit()
+            game.dispose()
+            game = Game(engine.window_rect, game.input_source, dirty_rects, seed=seed)
+
+        start = time.perf_counter()
+        engine.present(game.draw(engine.screen))
+        frame_times.append(time.perf_counter() - start)
+    game.exit()
+    game.dispose()
+    return frame_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Draw and present cost of the scaling modes at 1x, 2x and 4x')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for scale in args.scales:
+        for scale_mode, dirty_rects in ((SCALE_NEAREST, False), (SCALE_NEAREST, True), (SCALE_SMOOTH, False),
+                                        (SCALE_PRESCALED, False), (SCALE_PRESCALED, True)):
+            if scale == 1 and (scale_mode, dirty_rects) != (SCALE_NEAREST, False): continue
+            frame_times = sorted(scripted_run(scale, scale_mode, dirty_rects, args.frames, args.seed))
+            print('%dx %-10s %-12s mean %6.3f ms  p95 %6.3f ms' % (
+                scale, scale_mode if scale > 1 else 'direct', 'dirty rects' if dirty_rects else 'full frame',
+                1000 * sum(frame_times) / len(frame_times), 1000 * frame_times[len(frame_times) * 95 // 100]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import argparse, os, tempfile, time
+
+from scores import *
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Game thread cost of recording a score: synchronous write vs ScoreStore')
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        high_score_file = os.path.join(directory, 'high_score.txt')
+        sync, submit = [], []
+
+        for i in range(args.runs):
+            #a durable write done directly on the game thread
+            start = time.perf_counter()
+            atomic_write(high_score_file, str(i))
+            sync.append(time.perf_counter() - start)
+
+        store = ScoreStore(high_score_file, os.path.join(directory, 'leaderboard.json'))
+        for i in range(args.runs):
+            start = time.perf_counter()
+            store.submit(i, seed=i, duration=0)
+            submit.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        store.close()
+        drain = time.perf_counter() - start
+
+        sync.sort(), submit.sort()
+        print('synchronous write:  p50 %8.1f us  max %8.1f us' % (1e6 * sync[len(sync)//2], 1e6 * sync[-1]))
+        print('ScoreStore.submit:  p50 %8.1f us  max %8.1f us' % (1e6 * submit[len(submit)//2], 1e6 * submit[-1]))
+        print('writer drain:       %.1f ms for %d runs' % (1000 * drain, args.runs))
+        print('high score on disk: %d, leaderboard: %d entries, best %d' % (
+            read_high_score(high_score_file), len(store.leaderboard()), store.leaderboard()[0]['score']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import argparse, gc, os, tempfile, time
+from array import array
+
+from headless import *
+
+#restarts left out of the fit while allocator pools and caches fill up
+WARMUP = 100
+#what is kept of each switch into a new game, in columns allocated up front so the soak itself doesn't grow
+COLUMNS = ('memory', 'objects', 'retained', 'threads', 'collections', 'gc_ms')
+
+
+def slope(values):
+    #least squares growth per restart
+    n = len(values)
+    mean_x, mean_y = (n - 1) / 2, sum(values) / n
+    return sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values)) / sum((x - mean_x) ** 2 for x in range(n))
+
+
+def soak(restarts, ticks, seed, teardown):
+    random.seed(seed)
+    engine = HeadlessEngine(WINDOW_SIZE)
+    samples = {name: array('d', bytes(8 * restarts)) for name in COLUMNS}
+    pending = {name: 0.0 for name in ('collections', 'gc_ms')}
+    count = [0]
+
+    def log(record):
+        #collector work is summed over both switches of a run that goes through the game over screen
+        for name in pending: pending[name] += record[name]
+        if record['to'] != 'Game': return
+        i = count[0]
+        for name in COLUMNS: samples[name][i] = pending.get(name, record[name])
+        for name in pending: pending[name] = 0.0
+        count[0] += 1
+
+    tracker = SceneTracker(log=log, history=0)
+    dispose = Game.dispose
+    if not teardown: Game.dispose = Scene.dispose
+    start = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            scores = ScoreStore(os.path.join(directory, 'high_score.txt'), os.path.join(directory, 'leaderboard.json'))
+            manager = GameManager(engine.window_rect, RandomInput(seed), score_store=scores, tracker=tracker)
+            for i in range(restarts):
+                #every other run ends through the game over screen, the rest are restarted while playing
+                if i % 2 and manager.is_playing:
+                    manager.on_player_death()
+                    manager.update(1 / TICK_RATE)
+                    manager.current_scene.callback()
+                else: manager.on_start()
+                for j in range(ticks): manager.update(1 / TICK_RATE)
+            scores.close()
+    finally:
+        Game.dispose = dispose
+        tracker.close()
+    return samples, time.perf_counter() - start
+
+
+def report(label, samples, elapsed, tolerance):
+    steady = {name: column[WARMUP:] for name, column in samples.items()}
+    memory = slope(steady['memory'])
+    objects = slope(steady['objects'])
+    retained = max(steady['retained'])
+    threads = max(steady['threads'])
+    print('%-12s %9.1f KB %9.1f KB %10.1f B %10.2f %9d %8d %8d %10.1f %8.1f' % (
+        label, steady['memory'][0] / 1024, steady['memory'][-1] / 1024, memory, objects, retained, threads,
+        sum(samples['collections']), sum(samples['gc_ms']), elapsed))
+    return memory <= tolerance and objects <= 1 and retained <= 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory, objects and collector work over many restarts of a game')
+    parser.add_argument('--restarts', type=int, default=1000)
+    parser.add_argument('--ticks', type=int, default=30, help='ticks played between restarts')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tolerance', type=float, default=64, help='traced bytes a restart may add on average')
+    parser.add_argument('--without-teardown', action='store_true', help='also run with Game.dispose doing nothing')
+    args = parser.parse_args()
+
+    print('%-12s %12s %12s %12s %10s %9s %8s %8s %10s %8s' % (
+        '', 'memory at %d' % WARMUP, 'at the end', 'per restart', 'objects', 'retained', 'threads', 'gc runs', 'gc ms', 'seconds'))
+    runs = [('teardown', True)] + ([('no teardown', False)] if args.without_teardown else [])
+    flat = True
+    for label, teardown in runs:
+        gc.collect()
+        samples, elapsed = soak(args.restarts, args.ticks, args.seed, teardown)
+        ok = report(label, samples, elapsed, args.tolerance)
+        if teardown: flat = ok
+    print('memory: %s over %d restarts' % ('flat' if flat else 'GROWING', args.restarts))
+    if not flat: raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
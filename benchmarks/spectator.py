@@ -0,0 +1,80 @@
+import argparse, asyncio, multiprocessing, time
+
+from headless import *
+from spectator import *
+
+
+def run_clients(port, n_clients, duration, results):
+    stats = {'ticks': 0, 'bytes': 0, 'latency': []}
+
+    def on_tick(state, size):
+        stats['ticks'] += 1
+        stats['bytes'] += size
+        stats['latency'].append(time.perf_counter() - state.header[2])
+
+    async def spectate_all():
+        await asyncio.gather(*(spectate('127.0.0.1', port, on_tick, duration) for i in range(n_clients)))
+
+    asyncio.run(spectate_all())
+    results.put(stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Spectator server load test: local clients, bandwidth and tick latency')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    engine = HeadlessEngine(WINDOW_SIZE)
+    server = SpectatorServer('127.0.0.1', 0).start()
+
+    #the clients run in their own process so they don't compete with the game for the GIL
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    clients = context.Process(target=run_clients, args=(server.port, args.clients, None, results))
+    clients.start()
+    while len(server.spectators) < args.clients: time.sleep(0.01)
+
+    session = Session(engine.window_rect, RandomInput(args.seed))
+    costs, lateness, full, delta = [], [], [], []
+    next_tick = start = time.perf_counter()
+    while time.perf_counter() - start < args.seconds:
+        tick_start = time.perf_counter()
+        lateness.append(tick_start - next_tick)
+        session.update(engine.dt)
+        server.publish(session.game)
+        costs.append(time.perf_counter() - tick_start)
+
+        if len(costs) % 60 == 0:
+            snapshot = capture(session.game, 0)
+            full.append(len(encode(snapshot)))
+        next_tick += engine.dt
+        time.sleep(max(0, next_tick - time.perf_counter()))
+    elapsed = time.perf_counter() - start
+    session.close()
+
+    #closing the server ends every client connection
+    server.stop()
+    stats = results.get()
+    clients.join()
+
+    costs.sort(), lateness.sort()
+    latency = sorted(stats['latency'])
+    ticks = len(costs)
+    print('clients:           %d, %d game ticks in %.1f s' % (args.clients, ticks, elapsed))
+    print('game tick cost:    p50 %.3f ms  p99 %.3f ms (update + publish)' % (1000 * costs[ticks // 2], 1000 * costs[ticks * 99 // 100]))
+    print('tick lateness:     p99 %.3f ms' % (1000 * lateness[ticks * 99 // 100]))
+    print('delivered:         %.1f%% of client ticks, %d sends skipped for slow clients' % (
+        100 * stats['ticks'] / (ticks * args.clients), server.dropped))
+    print('latency:           p50 %.2f ms  p99 %.2f ms  (publish to client decode)' % (
+        1000 * latency[len(latency) // 2], 1000 * latency[len(latency) * 99 // 100]))
+    print('bandwidth:         %.2f KB/s per client, %.1f MB/s total' % (
+        stats['bytes'] / args.clients / elapsed / 1024, server.sent / elapsed / 1024**2))
+    print('message size:      %.0f bytes mean delta, %.0f bytes keyframe' % (
+        stats['bytes'] / max(stats['ticks'], 1), sum(full) / max(len(full), 1)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse, json, platform, subprocess, sys, time
+
+from headless import *
+from benchmarks.pools import revive
+import whirlybird
+
+LARGE_PLATFORMS = 5000
+#share of --warmup and --steps, and of --frames, a scenario runs: a tick of the large one costs as much as 50 others
+SCALE = {'large': (0.02, 0.2)}
+#the animated sheets whirlybird loads, with their frame heights
+SHEETS = (('./assets/moving.png', 7), ('./assets/break.png', PLATFORM_SIZE[1]), ('./assets/spike.png', 20),
+          ('./assets/cloud.png', PLATFORM_SIZE[1]), ('./assets/bounce.png', 7), ('./assets/hat.png', 7))
+IMPORT_SCRIPT = 'import time; start = time.perf_counter(); import whirlybird; print(time.perf_counter() - start)'
+
+
+def scroll(game):
+    #held moving up at the top of its band, the player drags the camera up every tick
+    player = game.player.sprite
+    player.speed.y = -JUMP_IMPULSE
+    player.pos.y = MIN_PLAYER_Y
+    player.falling_time = 0
+
+
+def keep_boosting(game):
+    player = game.player.sprite
+    if not player.is_boosting:
+        game.add_player_hat()
+        player.boost()
+
+
+def idle(window_rect, seed):
+    return Game(window_rect, ScriptedInput([NO_ACTION]), seed=seed), None
+
+
+def scrolling(window_rect, seed):
+    return Game(window_rect, RandomInput(seed), seed=seed), scroll
+
+
+def boost(window_rect, seed):
+    return Game(window_rect, RandomInput(seed), seed=seed), keep_boosting
+
+
+def churn(window_rect, seed):
+    game = Game(window_rect, RandomInput(seed), seed=seed)
+    #every new platform breaks or vanishes when landed on and is replaced right away
+    game.update_distribution = lambda: None
+    game.sampler = AliasTable({3: 1, 4: 1})
+    return game, None
+
+
+def large(window_rect, seed):
+    n_platforms, whirlybird.N_PLATFORMS = whirlybird.N_PLATFORMS, LARGE_PLATFORMS
+    try: game = Game(window_rect, RandomInput(seed), seed=seed)
+    finally: whirlybird.N_PLATFORMS = n_platforms
+    return game, None
+
+
+SCENARIOS = {'idle': idle, 'scrolling': scrolling, 'boost': boost, 'churn': churn, 'large': large}
+
+
+class Scenario:
+    def __init__(self, make, window_rect, seed):
+        self.game, self.hook = make(window_rect, seed)
+        #a run that would end is sent back up, so every scenario keeps going for as long as it is timed
+        self.game.callback = lambda: revive(self.game)
+
+    def close(self):
+        self.game.exit()
+        self.game.dispose()
+
+    def update(self, dt):
+        if self.hook: self.hook(self.game)
+        self.game.update(dt)
+
+
+def measure_update(scenario, steps, warmup):
+    for i in range(warmup): scenario.update(1 / TICK_RATE)
+    start = time.perf_counter()
+    for i in range(steps): scenario.update(1 / TICK_RATE)
+    return steps / (time.perf_counter() - start)
+
+
+def measure_draw(scenario, screen, frames):
+    elapsed = 0
+    for i in range(frames):
+        scenario.update(1 / TICK_RATE)
+        start = time.perf_counter()
+        scenario.game.draw(screen)
+        pygame.display.flip()
+        elapsed += time.perf_counter() - start
+    return elapsed / frames * 1e3
+
+
+def measure_outcome(draws, seed):
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for i in range(draws): outcome(START_DIST, rng)
+    return draws / (time.perf_counter() - start)
+
+
+def measure_load_animation(repeat, passes=100):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(passes):
+            for filename, frame_height in SHEETS: load_animation(filename, frame_height)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best: best = elapsed
+    return best / (passes * len(SHEETS)) * 1e3
+
+
+def measure_import(repeat):
+    #each import runs in a fresh interpreter, the fastest of a few runs is the least noisy
+    times = [float(subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], capture_output=True, text=True, check=True,
+                                  env=dict(os.environ, SDL_VIDEODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')).stdout)
+             for i in range(repeat)]
+    return min(times) * 1e3
+
+
+def run(args):
+    engine = HeadlessEngine(WINDOW_SIZE)
+    screen = pygame.display.set_mode(WINDOW_SIZE)
+    results = {}
+
+    def record(name, runs, unit, higher_is_better):
+        #the best of several runs: other work on the machine only ever slows a run down, so the best is the least noisy
+        value = max(runs) if higher_is_better else min(runs)
+        results[name] = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better, 'runs': runs}
+        print('%-24s %14.3f %-9s %6.1f%% spread' % (name, value, unit, (max(runs) - min(runs)) / value * 100))
+
+    for name in args.scenarios:
+        scale, frame_scale = SCALE.get(name, (1, 1))
+        steps, frames = max(int(args.steps * scale), 1), max(int(args.frames * frame_scale), 1)
+        updates, draws = [], []
+        for i in range(args.runs):
+            #every run starts the scenario over, so each one times the same ticks
+            random.seed(args.seed)
+            scenario = Scenario(SCENARIOS[name], engine.window_rect, args.seed)
+            try:
+                for j in range(int(args.warmup * scale)): scenario.update(1 / TICK_RATE)
+                updates.append(measure_update(scenario, steps, 0))
+                draws.append(measure_draw(scenario, screen, frames))
+            finally: scenario.close()
+        record('update.%s' % name, updates, 'steps/s', True)
+        record('draw.%s' % name, draws, 'ms/frame', False)
+
+    record('outcome', [measure_outcome(args.draws, args.seed) for i in range(args.runs)], 'draws/s', True)
+    record('load_animation', [measure_load_animation(args.repeat) for i in range(args.runs)], 'ms/sheet', False)
+    record('import.whirlybird', [measure_import(args.repeat) for i in range(args.runs)], 'ms', False)
+    return results
+
+
+def spread(result):
+    runs = result.get('runs', [result['value']])
+    return (max(runs) - min(runs)) / min(runs)
+
+
+def compare(results, baseline, tolerance):
+    #a change counts as a regression once it is worse than the baseline by more than the tolerance, which is widened
+    #to the spread of the baseline's and the current runs, so a noisy machine doesn't flag its own noise
+    regressions = []
+    print('%-24s %14s %14s %9s %10s' % ('benchmark', 'baseline', 'current', 'change', 'tolerance'))
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None: continue
+        change = result['value'] / base['value'] - 1
+        worse = -change if result['higher_is_better'] else change
+        allowed = max(tolerance, spread(base) + spread(result))
+        flag = ''
+        if worse > allowed:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print('%-24s %14.3f %14.3f %+8.1f%% %9.1f%%%s' % (name, base['value'], result['value'], change * 100,
+                                                        allowed * 100, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless benchmark suite with JSON results and baseline comparison')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--steps', type=int, default=5000)
+    parser.add_argument('--warmup', type=int, default=500)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--draws', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--runs', type=int, default=5, help='runs per benchmark, the best is reported and compared')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON results of an earlier run to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='smallest relative slowdown flagged, widened by the spread of the runs')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        report = {'python': platform.python_version(), 'pygame': pygame.version.ver, 'machine': platform.machine(),
+                  'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'args': vars(args), 'results': results}
+        with open(args.output, 'w') as f: json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)['results']
+        print()
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('%d regression(s): %s' % (len(regressions), ', '.join(regressions)))
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
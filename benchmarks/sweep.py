@@ -0,0 +1,51 @@
+import argparse, time
+
+from headless import *
+from benchmarks.pools import revive
+
+
+def run(step, seconds, seed):
+    random.seed(seed)
+    engine = HeadlessEngine(WINDOW_SIZE)
+    game = Game(engine.window_rect, RandomInput(seed), seed=seed)
+    game.callback = lambda: revive(game)
+    platforms = game.platforms
+    sweep = platforms.sweep
+    stats = {'landings': 0, 'missed': 0, 'sweep': 0.0, 'collide': 0.0, 'checks': 0}
+
+    def timed_sweep(start, end):
+        #the same query answered both ways, only the swept answer is used by the game
+        t0 = time.perf_counter()
+        collided, contact = sweep(start, end)
+        t1 = time.perf_counter()
+        discrete = platforms.collide(end)
+        stats['sweep'] += t1 - t0
+        stats['collide'] += time.perf_counter() - t1
+        stats['checks'] += 1
+        if collided and game.player.sprite.speed.y > 0 and discrete is None: stats['missed'] += 1
+        return collided, contact
+
+    platforms.sweep = timed_sweep
+    for i in range(int(seconds * TICK_RATE / step)):
+        game.update(step / TICK_RATE)
+        if game.contact_time is not None: stats['landings'] += 1
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Landings a discrete overlap test misses at larger timesteps, and what sweeping costs')
+    parser.add_argument('--steps', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seconds', type=float, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('%6s %10s %16s %12s %12s' % ('ticks', 'landings', 'missed without', 'sweep us', 'overlap us'))
+    for step in args.steps:
+        stats = run(step, args.seconds, args.seed)
+        checks = max(stats['checks'], 1)
+        print('%6d %10d %16d %12.2f %12.2f' % (step, stats['landings'], stats['missed'],
+                                               stats['sweep'] / checks * 1e6, stats['collide'] / checks * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import argparse, json, mmap, os, struct, time
+import pygame
+
+BUNDLE_PATH = './assets/sprites.bundle'
+MAGIC = b'WBAB'
+VERSION = 1
+#magic, version, length of the JSON index that follows, then the raw RGBA pixels of every sheet
+HEADER = struct.Struct('<4sHI')
+
+
+def source_stamp(filename):
+    stat = os.stat(filename)
+    return [filename, stat.st_mtime_ns, stat.st_size]
+
+
+def build_bundle(sources, path=BUNDLE_PATH):
+    #sources maps sheet names to (filename, frame height, flip_x), as registered with AssetManager.load
+    index, pixels, offset = {}, [], 0
+    for name, (filename, frame_height, flip_x) in sources.items():
+        sheet = pygame.image.load(filename)
+        if flip_x: sheet = pygame.transform.flip(sheet, True, False)
+        data = pygame.image.tobytes(sheet, 'RGBA')
+        index[name] = {'offset': offset, 'size': sheet.get_size(), 'frame_height': frame_height or sheet.get_height(),
+                       'flip_x': flip_x, 'source': source_stamp(filename)}
+        pixels.append(data)
+        offset += len(data)
+
+    encoded = json.dumps(index).encode()
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(encoded)))
+        f.write(encoded)
+        for data in pixels: f.write(data)
+    os.replace(tmp, path)
+    return index
+
+
+class AssetBundle:
+    #the file is mapped, not read, a sheet's pixels are only touched when a surface is made from them
+    def __init__(self, path=BUNDLE_PATH):
+        self.path = path
+        with open(path, 'rb') as f: self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, length = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION: raise ValueError('not a version %d asset bundle' % VERSION)
+        self.index = json.loads(self.data[HEADER.size:HEADER.size + length])
+        self.start = HEADER.size + length
+
+    def entry(self, name, filename, frame_height=None, flip_x=False):
+        #None when the sheet is missing or was built from another version of its png
+        entry = self.index.get(name)
+        if entry is None or entry['flip_x'] != flip_x: return None
+        if frame_height is not None and entry['frame_height'] != frame_height: return None
+        try:
+            if entry['source'] != source_stamp(filename): return None
+        except OSError: pass
+        return entry
+
+    def sheet(self, name):
+        entry = self.index[name]
+        width, height = entry['size']
+        start = self.start + entry['offset']
+        #the surface shares the mapped memory instead of copying it
+        surface = pygame.image.frombuffer(memoryview(self.data)[start:start + width * height * 4], (width, height), 'RGBA')
+        return surface, entry['frame_height']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack the sprite sheets whirlybird loads into one raw pixel bundle')
+    parser.add_argument('--output', default=BUNDLE_PATH)
+    args = parser.parse_args()
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    #importing the game only registers its sheets, nothing is decoded until the bundle is built
+    from whirlybird import assets
+    start = time.perf_counter()
+    index = build_bundle(assets.sources, args.output)
+    print('%d sheets, %d bytes in %s (%.1f ms)' % (len(index), os.path.getsize(args.output), args.output,
+                                                     (time.perf_counter() - start) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import random, threading, queue, weakref, itertools, collections
+from array import array
+
+CHUNK_SIZE = 32
+CHUNKS_AHEAD = 4
+#consumed chunks kept so the stream can seek back, enough for any rewind window
+CHUNKS_KEPT = 64
+RECORD_SIZE = 4
+
+
+def level_records(seed, roll, chunk_size=CHUNK_SIZE):
+    #the level as an endless series of chunks of packed records, roll(rng) makes one RECORD_SIZE field record
+    rng = random.Random('level-%s' % seed)
+    while True:
+        chunk = array('d')
+        for i in range(chunk_size): chunk.extend(roll(rng))
+        yield chunk
+
+
+def produce(chunks, ready, stopped):
+    for chunk in chunks:
+        ready.put(chunk)
+        if stopped.is_set(): return
+
+
+def stop(ready, stopped):
+    stopped.set()
+    #frees a slot for a producer blocked on a full queue so it can see the flag
+    try: ready.get_nowait()
+    except queue.Empty: pass
+
+
+class LevelStream:
+    def __init__(self, seed, roll, chunk_size=CHUNK_SIZE, ahead=CHUNKS_AHEAD):
+        self.seed = seed
+        self.roll = roll
+        self.chunk_size = chunk_size
+        self.ready = queue.Queue(ahead)
+        self.stopped = threading.Event()
+
+        self.chunk = array('d')
+        self.index = 0
+        #number of the current chunk, and how many chunks came from the worker so far
+        self.number = -1
+        self.fetched = 0
+        self.kept = collections.OrderedDict()
+
+        #the worker holds no reference to the stream, so dropping the stream stops it
+        self.thread = threading.Thread(target=produce, args=(level_records(seed, roll, chunk_size), self.ready, self.stopped),
+                                       name='level-stream', daemon=True)
+        self.thread.start()
+        self.close = weakref.finalize(self, stop, self.ready, self.stopped)
+
+    def next(self):
+        if self.index == len(self.chunk):
+            self.chunk = self.chunk_at(self.number + 1)
+            self.number += 1
+            self.index = 0
+        chunk, i = self.chunk, self.index
+        self.index += RECORD_SIZE
+        return chunk[i], chunk[i+1], chunk[i+2], chunk[i+3]
+
+    def chunk_at(self, number):
+        chunk = self.kept.get(number)
+        if chunk is not None: return chunk
+        if number == self.fetched:
+            chunk = self.ready.get()
+            self.fetched += 1
+            self.kept[number] = chunk
+            if len(self.kept) > CHUNKS_KEPT: self.kept.popitem(last=False)
+            return chunk
+        #older than anything kept: roll it again from the seed
+        return next(itertools.islice(level_records(self.seed, self.roll, self.chunk_size), number, None))
+
+    def tell(self):
+        #records consumed so far
+        return self.number * self.chunk_size + self.index // RECORD_SIZE if self.number >= 0 else 0
+
+    def seek(self, position):
+        number, record = divmod(position, self.chunk_size)
+        if number == 0 and record == 0 and self.number < 0: return
+        if record == 0 and number > 0:
+            #stay at the end of the previous chunk, like next() does
+            number, record = number - 1, self.chunk_size
+        self.chunk = self.chunk_at(number)
+        self.number = number
+        self.index = record * RECORD_SIZE
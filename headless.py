@@ -0,0 +1,73 @@
+import random
+from whirlybird import *
+
+
+class ScriptedInput:
+    def __init__(self, actions):
+        self.actions = list(actions)
+        self.index = 0
+
+    def __call__(self):
+        action = self.actions[self.index]
+        self.index = (self.index + 1) % len(self.actions)
+        return action
+
+
+class RandomInput:
+    def __init__(self, seed=None, hold=10):
+        self.rng = random.Random(seed)
+        self.hold = hold
+        self.remaining = 0
+        self.action = NO_ACTION
+
+    def __call__(self):
+        if self.remaining <= 0:
+            self.action = self.rng.choice((NO_ACTION, MOVE_LEFT, MOVE_RIGHT))
+            self.remaining = self.rng.randint(1, self.hold)
+        self.remaining -= 1
+        return self.action
+
+
+class Session:
+    def __init__(self, window_rect, input_source, max_episodes=None):
+        self.window_rect = window_rect
+        self.input_source = input_source
+        self.max_episodes = max_episodes
+
+        self.episodes = 0
+        self.scores = []
+        self.high_score = 0
+        self.callback = None
+
+        self.game = None
+        self.is_over = False
+        self.restart()
+
+    def restart(self):
+        #the replaced game's level worker stops now, not whenever the game is collected
+        self.close()
+        self.game = Game(self.window_rect, self.input_source)
+        self.game.callback = self.on_player_death
+        self.game.update_high_score_callback = self.update_high_score
+        self.is_over = False
+
+    def close(self):
+        if self.game is None: return
+        self.game.exit()
+        self.game.dispose()
+        self.game = None
+
+    def update_high_score(self, new_score):
+        if new_score > self.high_score: self.high_score = new_score
+
+    def on_player_death(self):
+        self.is_over = True
+
+    def update(self, dt):
+        self.game.update(dt)
+        if self.is_over:
+            self.episodes += 1
+            self.scores.append(self.game.score)
+            if self.max_episodes is not None and self.episodes >= self.max_episodes:
+                if self.callback: self.callback()
+            else: self.restart()
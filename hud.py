@@ -0,0 +1,80 @@
+import pygame
+
+HUD_FONT = ('Arial', 30, True)
+DIGITS = '0123456789'
+
+
+class FontRegistry:
+    def __init__(self):
+        self.fonts = {}
+
+    def get(self, name, size, bold=False):
+        key = (name, size, bold)
+        if key not in self.fonts:
+            self.fonts[key] = pygame.font.SysFont(name, size, bold)
+        return self.fonts[key]
+
+
+class TextCache:
+    def __init__(self, fonts):
+        self.fonts = fonts
+        self.surfaces = {}
+
+    def render(self, text, color, font=HUD_FONT):
+        key = (text, color, font)
+        if key not in self.surfaces:
+            self.surfaces[key] = self.fonts.get(*font).render(text, True, color)
+        return self.surfaces[key]
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+class GlyphAtlas:
+    def __init__(self, font, chars, color):
+        glyphs = [font.render(char, True, color) for char in chars]
+        self.height = max(glyph.get_height() for glyph in glyphs)
+
+        self.surface = pygame.Surface((sum(glyph.get_width() for glyph in glyphs), self.height), pygame.SRCALPHA)
+        self.rects = {}
+        x = 0
+        for char, glyph in zip(chars, glyphs):
+            self.rects[char] = self.surface.blit(glyph, (x, 0))
+            x += glyph.get_width()
+
+    def width(self, text):
+        return sum(self.rects[char].width for char in text)
+
+    def render(self, text):
+        surface = pygame.Surface((self.width(text), self.height), pygame.SRCALPHA)
+        x = 0
+        blits = []
+        for char in text:
+            rect = self.rects[char]
+            blits.append((self.surface, (x, 0), rect))
+            x += rect.width
+        surface.blits(blits, False)
+        return surface
+
+
+class CounterText:
+    def __init__(self, atlas, template):
+        self.atlas = atlas
+        self.template = template
+        self.values = None
+        self.surface = None
+
+    def render(self, *values):
+        if values != self.values:
+            self.values = values
+            self.surface = self.atlas.render(self.template % values)
+        return self.surface
+
+
+fonts = FontRegistry()
+text_cache = TextCache(fonts)
+
+
+def score_counter(color='black', template='%s HI: %s'):
+    chars = DIGITS + ''.join(sorted(set(template.replace('%s', ''))))
+    return CounterText(GlyphAtlas(fonts.get(*HUD_FONT), chars, color), template)
@@ -0,0 +1,57 @@
+import collections, gc, threading, time, tracemalloc, weakref
+
+#switches kept in SceneTracker.switches
+SWITCHES_KEPT = 1000
+
+
+class SceneTracker:
+    #what every scene switch leaves behind: traced memory, objects the collector tracks, threads, replaced scenes
+    #still alive without a collection, and the collector's own work since the switch before
+    def __init__(self, trace=True, count_objects=True, log=None, history=SWITCHES_KEPT):
+        self.started_tracing = trace and not tracemalloc.is_tracing()
+        if self.started_tracing: tracemalloc.start()
+        self.count_objects = count_objects
+        self.log = log
+        self.replaced = weakref.WeakSet()
+        self.switches = collections.deque(maxlen=history)
+        self.count = 0
+        self.collections = 0
+        self.collected = 0
+        self.gc_time = 0.0
+        self.gc_start = None
+        gc.callbacks.append(self.on_gc)
+
+    def on_gc(self, phase, info):
+        if phase == 'start':
+            self.gc_start = time.perf_counter()
+            return
+        self.collections += 1
+        self.collected += info['collected']
+        if self.gc_start is not None: self.gc_time += time.perf_counter() - self.gc_start
+
+    def switch(self, old, new):
+        #old scenes should be gone by refcounting alone once disposed, anything in replaced was kept alive
+        self.count += 1
+        record = {'switch': self.count, 'from': type(old).__name__, 'to': type(new).__name__,
+                  'memory': tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None,
+                  'objects': len(gc.get_objects()) if self.count_objects else None,
+                  'retained': len(self.replaced), 'threads': threading.active_count(),
+                  'collections': self.collections, 'collected': self.collected, 'gc_ms': self.gc_time * 1e3}
+        self.replaced.add(old)
+        self.collections = self.collected = 0
+        self.gc_time = 0.0
+        self.switches.append(record)
+        if self.log: self.log(record)
+        return record
+
+    def close(self):
+        gc.callbacks.remove(self.on_gc)
+        if self.started_tracing: tracemalloc.stop()
+
+
+def format_switch(record):
+    memory = '-' if record['memory'] is None else '%.1f KB' % (record['memory'] / 1024)
+    objects = '-' if record['objects'] is None else record['objects']
+    return ('switch %d %s -> %s: %s traced, %s objects, %d scenes retained, %d threads, %d collections freed %d in %.1f ms'
+            % (record['switch'], record['from'], record['to'], memory, objects, record['retained'], record['threads'],
+               record['collections'], record['collected'], record['gc_ms']))
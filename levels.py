@@ -0,0 +1,163 @@
+import os
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse, json, multiprocessing, time
+
+from whirlybird import *
+
+KIND_NAMES = ('bounce', 'still', 'moving', 'breakable', 'cloud', 'spike')
+BOUNCE, CLOUD = 0, 4
+
+#how far above a platform the player can get after touching it
+JUMP_REACH = JUMP_IMPULSE ** 2 / (2 * GRAVITY)
+BOUNCE_REACH = (2 * JUMP_IMPULSE) ** 2 / (2 * GRAVITY)
+HAT_REACH = max(JUMP_REACH, BOOST_TIMEOUT * JUMP_IMPULSE)
+
+#score gained per platform climbed: one point per scrolling tick, scrolling at boost speed up to the mean jump speed
+PACE = (PLATFORM_SPACING / JUMP_IMPULSE, 2 * PLATFORM_SPACING / JUMP_IMPULSE)
+
+
+def generate_level(seed, n_platforms, score_per_platform, width=WINDOW_SIZE[0]):
+    #the platform column Game(seed=seed) builds, with the score at which each platform is spawned
+    chunks = level_records(seed, functools.partial(roll_platform, width=width))
+    sampler = AliasTable(FIRST_SCREEN_DIST)
+    tier = None
+    chunk, index = (), 0
+
+    for i in range(n_platforms):
+        if index == len(chunk): chunk, index = next(chunks), 0
+        u, has_hat = chunk[index], chunk[index+1]
+        index += RECORD_SIZE
+
+        score = int(max(0, i - N_PLATFORMS) * score_per_platform)
+        if i >= N_PLATFORMS and score // DIFFICULTY_STEP != tier:
+            tier = score // DIFFICULTY_STEP
+            sampler = AliasTable(tier_weights(tier))
+        kind = sampler.pick(u)
+        yield score, kind, bool(has_hat) and kind in (1, 2)
+
+
+def analyze(job):
+    first_seed, n_seeds, n_platforms, n_bands, pace = job
+    #band 0 is the first screen, band b + 1 covers scores [b * DIFFICULTY_STEP, (b + 1) * DIFFICULTY_STEP)
+    kinds = [[0] * len(KIND_NAMES) for b in range(n_bands + 1)]
+    hats = [0] * (n_bands + 1)
+    supports = [0] * (n_bands + 1)
+    gaps = [0] * (n_bands + 1)
+    levels_with_gap = 0
+
+    for seed in range(first_seed, first_seed + n_seeds):
+        score_per_platform = random.Random(-seed - 1).uniform(*pace)
+        #the player starts mid screen and drops onto the first platform it meets
+        reach_top = WINDOW_SIZE[1] // 2
+        has_gap = False
+        for i, (score, kind, has_hat) in enumerate(generate_level(seed, n_platforms, score_per_platform)):
+            band = 0 if i < N_PLATFORMS else min(n_bands, score // DIFFICULTY_STEP + 1)
+            kinds[band][kind] += 1
+            hats[band] += has_hat
+            if kind == CLOUD: continue
+
+            #the player falls through clouds, every other platform can be stood on
+            y = i * PLATFORM_SPACING
+            supports[band] += 1
+            if y > reach_top:
+                gaps[band] += 1
+                has_gap = True
+            reach = HAT_REACH if has_hat else BOUNCE_REACH if kind == BOUNCE else JUMP_REACH
+            reach_top = max(reach_top, y + reach)
+        levels_with_gap += has_gap
+
+    return n_seeds, kinds, hats, supports, gaps, levels_with_gap
+
+
+class Summary:
+    def __init__(self, n_bands, n_platforms, pace):
+        self.n_bands = n_bands
+        self.n_platforms = n_platforms
+        self.pace = pace
+        self.seeds = 0
+        self.kinds = [[0] * len(KIND_NAMES) for b in range(n_bands + 1)]
+        self.hats = [0] * (n_bands + 1)
+        self.supports = [0] * (n_bands + 1)
+        self.gaps = [0] * (n_bands + 1)
+        self.levels_with_gap = 0
+
+    def merge(self, result):
+        seeds, kinds, hats, supports, gaps, levels_with_gap = result
+        self.seeds += seeds
+        for band in range(self.n_bands + 1):
+            for kind, count in enumerate(kinds[band]): self.kinds[band][kind] += count
+            self.hats[band] += hats[band]
+            self.supports[band] += supports[band]
+            self.gaps[band] += gaps[band]
+        self.levels_with_gap += levels_with_gap
+
+    def to_dict(self):
+        bands = []
+        for band in range(self.n_bands + 1):
+            platforms = sum(self.kinds[band])
+            if not platforms: continue
+            bands.append({
+                'scores': 'start' if band == 0 else '%d+' % ((band - 1) * DIFFICULTY_STEP) if band == self.n_bands
+                          else '%d-%d' % ((band - 1) * DIFFICULTY_STEP, band * DIFFICULTY_STEP),
+                'platforms': platforms,
+                'types': {name: count / platforms for name, count in zip(KIND_NAMES, self.kinds[band])},
+                'hat_rate': self.hats[band] / platforms,
+                'unreachable_gap_rate': self.gaps[band] / max(self.supports[band], 1),
+            })
+        return {
+            'seeds': self.seeds,
+            'platforms_per_level': self.n_platforms,
+            'score_per_platform': self.pace,
+            'reach': {'jump': JUMP_REACH, 'bounce': BOUNCE_REACH, 'hat': HAT_REACH},
+            'levels_with_unreachable_gap': self.levels_with_gap / max(self.seeds, 1),
+            'bands': bands,
+        }
+
+    def save(self, filename):
+        atomic_write(filename, json.dumps(self.to_dict(), indent=1))
+
+    def print(self):
+        summary = self.to_dict()
+        print('%d levels of %d platforms, %.1f%% with an unreachable gap' % (
+            summary['seeds'], summary['platforms_per_level'], 100 * summary['levels_with_unreachable_gap']))
+        print('%-10s %10s ' % ('scores', 'platforms') + ' '.join('%9s' % name for name in KIND_NAMES) + '      hats      gaps')
+        for band in summary['bands']:
+            print('%-10s %10d ' % (band['scores'], band['platforms'])
+                  + ' '.join('%8.2f%%' % (100 * band['types'][name]) for name in KIND_NAMES)
+                  + '  %7.2f%%  %7.3f%%' % (100 * band['hat_rate'], 100 * band['unreachable_gap_rate']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo analysis of the procedural level generator')
+    parser.add_argument('--seeds', type=int, default=100000)
+    parser.add_argument('--platforms', type=int, default=1000, help='platforms generated per level')
+    parser.add_argument('--bands', type=int, default=10, help='score bands of DIFFICULTY_STEP, the last one open ended')
+    parser.add_argument('--pace', type=float, nargs=2, default=PACE, help='range of score gained per platform')
+    parser.add_argument('--chunk', type=int, default=500, help='seeds per job')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', default='level-summary.json')
+    parser.add_argument('--save-every', type=float, default=5, help='seconds between summary writes')
+    args = parser.parse_args()
+
+    jobs = [(first, min(args.chunk, args.seeds - first), args.platforms, args.bands, tuple(args.pace))
+            for first in range(0, args.seeds, args.chunk)]
+    summary = Summary(args.bands, args.platforms, tuple(args.pace))
+
+    start = saved = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        #per level results are folded into the running totals as soon as a job finishes
+        for result in pool.imap_unordered(analyze, jobs):
+            summary.merge(result)
+            if time.perf_counter() - saved > args.save_every:
+                summary.save(args.output)
+                saved = time.perf_counter()
+    elapsed = time.perf_counter() - start
+
+    summary.save(args.output)
+    summary.print()
+    print('%d workers, %.1f s, %.0f levels/sec, summary in %s' % (args.workers, elapsed, summary.seeds / elapsed, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import pygame, collections, threading, time
+
+#drawn frames older than this are replaced by a newer one instead of waiting to be shown
+MAX_LATENCY = 0.05
+#fills are kept as (FILL, color, rect, flags) between the (surface, position, area, flags) blits
+FILL = None
+
+#ops: the draw calls in order, rects: what present() updates, None for the whole window
+#stamp: when the simulation drew it, inputs: when the oldest input it is the first to show was read
+Frame = collections.namedtuple('Frame', 'ops rects stamp inputs')
+
+
+class DrawRecorder:
+    #stands in for the screen on the simulation thread: keeps the draw calls for the render thread to replay
+    def __init__(self, size):
+        self.rect = pygame.Rect((0, 0), size)
+        self.ops = []
+
+    def get_rect(self, **kwargs):
+        rect = self.rect.copy()
+        for name, value in kwargs.items(): setattr(rect, name, value)
+        return rect
+
+    def get_size(self): return self.rect.size
+    def get_width(self): return self.rect.width
+    def get_height(self): return self.rect.height
+
+    def fill(self, color, rect=None, special_flags=0):
+        rect = self.rect.copy() if rect is None else pygame.Rect(rect).clip(self.rect)
+        self.ops.append((FILL, color, tuple(rect), special_flags))
+        return rect
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        #positions and areas are copied, the sprite rects they came from keep moving
+        x, y = dest[0], dest[1]
+        if area is not None:
+            area = tuple(area)
+            size = area[2:]
+        else: size = source.get_size()
+        self.ops.append((source, (x, y), area, special_flags))
+        rect = pygame.Rect((x, y), size).clip(self.rect)
+        #what blit returns when nothing is drawn: the position moved inside the top left edges, without size
+        if not rect: rect = pygame.Rect(max(x, self.rect.x), max(y, self.rect.y), 0, 0)
+        return rect
+
+    def blits(self, blit_sequence, doreturn=1):
+        rects = [self.blit(*item) for item in blit_sequence]
+        if doreturn: return rects
+
+    def take(self):
+        ops = tuple(self.ops)
+        self.ops.clear()
+        return ops
+
+
+def replay(screen, ops):
+    #consecutive blits go to the screen in one call
+    blits = []
+    for op in ops:
+        if op[0] is FILL:
+            if blits:
+                screen.blits(blits, 0)
+                blits = []
+            screen.fill(op[1], op[2], op[3])
+        else: blits.append(op)
+    if blits: screen.blits(blits, 0)
+
+
+class FrameBuffer:
+    #the frame being shown on the render thread and at most one more waiting for it
+    def __init__(self, max_latency=MAX_LATENCY):
+        self.max_latency = max_latency
+        self.pending = None
+        self.condition = threading.Condition()
+        self.replaced = 0
+
+    def ready(self):
+        with self.condition:
+            pending = self.pending
+            if pending is None: return True
+            #a dirty rect frame only updates what changed since the one before it, so it is never dropped
+            return pending.rects is None and time.perf_counter() - pending.stamp > self.max_latency
+
+    def put(self, frame):
+        with self.condition:
+            if self.pending is not None:
+                self.replaced += 1
+                #inputs the replaced frame was first to show are shown by this one instead
+                if frame.inputs is None: frame = frame._replace(inputs=self.pending.inputs)
+                #a dirty rect frame only draws over what changed, so a whole frame it replaces is replayed under it
+                if self.pending.rects is None and frame.rects is not None:
+                    frame = frame._replace(ops=self.pending.ops + frame.ops, rects=None)
+            self.pending = frame
+            self.condition.notify_all()
+
+    def take(self, timeout):
+        with self.condition:
+            if self.pending is None: self.condition.wait(timeout)
+            frame, self.pending = self.pending, None
+            self.condition.notify_all()
+            return frame
+
+    def wait_taken(self, timeout):
+        with self.condition:
+            if self.pending is not None: self.condition.wait(timeout)
@@ -0,0 +1,120 @@
+import pygame, time, json, csv
+from array import array
+
+PHASES = ('dispatch', 'sprites', 'collision', 'scroll', 'platforms', 'distribution', 'update_other',
+          'draw', 'flip', 'idle')
+DISPATCH, SPRITES, COLLISION, SCROLL, PLATFORMS, DISTRIBUTION, UPDATE_OTHER, DRAW, FLIP, IDLE = range(len(PHASES))
+
+
+def percentile(values, p):
+    if not values: return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class FrameProfiler:
+    def __init__(self, capacity=1200):
+        self.enabled = False
+        self.capacity = capacity
+        self.columns = len(PHASES)
+
+        #one row per frame: the time spent in each phase, oldest rows overwritten first
+        self.samples = array('d', bytes(8 * capacity * self.columns))
+        self.frames = 0
+
+        self.current = [0.0] * self.columns
+        self.last = 0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        if self.enabled: self.begin_frame()
+
+    def clear(self):
+        self.frames = 0
+
+    def begin_frame(self):
+        for i in range(self.columns): self.current[i] = 0.0
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        row = (self.frames % self.capacity) * self.columns
+        for i, value in enumerate(self.current): self.samples[row + i] = value
+        self.frames += 1
+
+    def rows(self):
+        count = min(self.frames, self.capacity)
+        first = self.frames - count
+        for frame in range(first, self.frames):
+            row = (frame % self.capacity) * self.columns
+            yield frame, self.samples[row:row + self.columns]
+
+    def frame_times(self, include_idle=False):
+        return [sum(row) - (0 if include_idle else row[IDLE]) for _, row in self.rows()]
+
+    def summary(self):
+        busy = self.frame_times()
+        total = self.frame_times(include_idle=True)
+        phases = {name: [] for name in PHASES}
+        for _, row in self.rows():
+            for name, value in zip(PHASES, row): phases[name].append(value)
+
+        return {
+            'frames': len(busy),
+            'busy_ms': {'p50': 1000 * percentile(busy, 50), 'p95': 1000 * percentile(busy, 95),
+                        'p99': 1000 * percentile(busy, 99)},
+            'frame_ms': {'p50': 1000 * percentile(total, 50), 'p95': 1000 * percentile(total, 95),
+                         'p99': 1000 * percentile(total, 99)},
+            'phase_mean_ms': {name: 1000 * sum(values) / max(len(values), 1) for name, values in phases.items()},
+        }
+
+    def export_csv(self, filename):
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('frame',) + tuple(name + '_ms' for name in PHASES))
+            for frame, row in self.rows():
+                writer.writerow([frame] + ['%.4f' % (1000 * value) for value in row])
+
+    def export_json(self, filename):
+        trace = {
+            'phases': PHASES,
+            'summary': self.summary(),
+            'frames': [{'frame': frame, **{name: 1000 * value for name, value in zip(PHASES, row)}}
+                       for frame, row in self.rows()],
+        }
+        with open(filename, 'w') as f: json.dump(trace, f, indent=1)
+
+
+class ProfilerOverlay:
+    def __init__(self, profiler, font, refresh_frames=30):
+        self.profiler = profiler
+        self.font = font
+        self.refresh_frames = refresh_frames
+        self.surface = None
+        self.rendered_at = -refresh_frames
+
+    def render(self):
+        summary = self.profiler.summary()
+        means = summary['phase_mean_ms']
+        lines = ['frame p50 %.2f p95 %.2f p99 %.2f ms' % tuple(summary['busy_ms'].values())]
+        lines += ['%-12s %6.3f ms' % (name, means[name]) for name in PHASES]
+
+        line_height = self.font.get_linesize()
+        surfaces = [self.font.render(line, True, 'white') for line in lines]
+        self.surface = pygame.Surface((max(s.get_width() for s in surfaces) + 8, line_height * len(lines) + 8))
+        self.surface.fill('black')
+        self.surface.set_alpha(200)
+        for i, surface in enumerate(surfaces): self.surface.blit(surface, (4, 4 + i * line_height))
+
+    def draw(self, screen):
+        if self.profiler.frames - self.rendered_at >= self.refresh_frames:
+            self.render()
+            self.rendered_at = self.profiler.frames
+        return screen.blit(self.surface, (screen.get_width() - self.surface.get_width(), 0))
+
+
+profiler = FrameProfiler()
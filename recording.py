@@ -0,0 +1,83 @@
+import hashlib, struct
+
+MAGIC = b'WBRP'
+VERSION = 5
+#magic, version, seed, tick rate, ticks, final score, death tick (0 if alive), state digest
+HEADER = struct.Struct('<4sBQHIIi20s')
+#one run of identical actions: action, run length
+RUN = struct.Struct('<BH')
+MAX_RUN = 0xffff
+
+
+def state_digest(game):
+    player = game.player.sprite
+    state = (tuple(player.pos), player.speed.y, player.is_boosting, player.time_boosting, player.falling_time,
+             game.score, game.camera_y, tuple(game.end_pos),
+             tuple(sorted((type(p).__name__, tuple(p.rect)) for p in game.platforms)))
+    return hashlib.sha1(repr(state).encode()).digest()
+
+
+class Recorder:
+    def __init__(self, source):
+        self.source = source
+        self.actions = bytearray()
+
+    def __call__(self):
+        action = self.source()
+        self.actions.append(action)
+        return action
+
+
+class ReplayInput:
+    def __init__(self, actions):
+        self.actions = actions
+        self.index = 0
+
+    def __call__(self):
+        action = self.actions[self.index]
+        self.index += 1
+        return action
+
+
+class Replay:
+    def __init__(self, seed, actions, tick_rate, score=0, death_tick=-1, digest=bytes(20)):
+        self.seed = seed
+        self.actions = actions
+        self.score = score
+        self.death_tick = death_tick
+        self.digest = digest
+        self.tick_rate = tick_rate
+
+    @classmethod
+    def from_game(cls, game, recorder, tick_rate, death_tick=-1):
+        return cls(game.seed, bytes(recorder.actions), tick_rate, game.score, death_tick, state_digest(game))
+
+    def encode(self):
+        runs = bytearray()
+        i = 0
+        while i < len(self.actions):
+            action, length = self.actions[i], 1
+            while i + length < len(self.actions) and self.actions[i + length] == action and length < MAX_RUN:
+                length += 1
+            runs += RUN.pack(action, length)
+            i += length
+        return HEADER.pack(MAGIC, VERSION, self.seed, self.tick_rate, len(self.actions), self.score,
+                           self.death_tick, self.digest) + runs
+
+    @classmethod
+    def decode(cls, data):
+        magic, version, seed, tick_rate, ticks, score, death_tick, digest = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION: raise ValueError('not a version %d replay' % VERSION)
+
+        actions = bytearray()
+        for action, length in RUN.iter_unpack(data[HEADER.size:]):
+            actions += bytes((action,)) * length
+        if len(actions) != ticks: raise ValueError('replay is truncated')
+        return cls(seed, bytes(actions), tick_rate, score, death_tick, digest)
+
+    def save(self, filename):
+        with open(filename, 'wb') as f: f.write(self.encode())
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as f: return cls.decode(f.read())
@@ -0,0 +1,50 @@
+import argparse, time
+
+from headless import *
+from recording import *
+
+
+def run_replay(replay, window_rect):
+    game = Game(window_rect, ReplayInput(replay.actions), seed=replay.seed)
+    deaths = []
+    #the callback has to exist, spike platforms only kill when Game.callback is set
+    game.callback = lambda: deaths.append(tick)
+
+    dt = 1 / replay.tick_rate
+    try:
+        for tick in range(len(replay.actions)):
+            game.update(dt)
+
+        death_tick = deaths[0] if deaths else -1
+        matches = game.score == replay.score and death_tick == replay.death_tick and state_digest(game) == replay.digest
+        return game.score, matches
+    finally:
+        game.exit()
+        game.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-run recorded sessions headless and verify the outcome')
+    parser.add_argument('replays', nargs='+')
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    engine = HeadlessEngine(WINDOW_SIZE)
+    failed = False
+    for filename in args.replays:
+        replay = Replay.load(filename)
+        start = time.perf_counter()
+        for i in range(args.repeat):
+            score, matches = run_replay(replay, engine.window_rect)
+        elapsed = time.perf_counter() - start
+
+        failed |= not matches
+        print('%s: %d ticks, score %d, %s, %.0f ticks/sec' % (
+            filename, len(replay.actions), score, 'match' if matches else 'MISMATCH',
+            args.repeat * len(replay.actions) / elapsed))
+
+    if failed: raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+from array import array
+
+REWIND_SLOT = 4096
+
+
+class RewindBuffer:
+    #one save state per tick in fixed size slots of a single block, the oldest is overwritten when it is full
+    def __init__(self, capacity, slot_size=REWIND_SLOT):
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self.memory = bytearray(capacity * slot_size)
+        self.view = memoryview(self.memory)
+        self.lengths = array('I', [0]) * capacity
+        self.start = 0
+        self.count = 0
+        self.overflows = 0
+
+    def __len__(self):
+        return self.count
+
+    def push(self, state):
+        if len(state) > self.slot_size:
+            #a gap would make the history jump, so it starts over instead
+            self.overflows += 1
+            self.clear()
+            return
+        if self.count == self.capacity: self.start = (self.start + 1) % self.capacity
+        else: self.count += 1
+        i = (self.start + self.count - 1) % self.capacity
+        offset = i * self.slot_size
+        self.view[offset:offset + len(state)] = state
+        self.lengths[i] = len(state)
+
+    def pop(self):
+        #the newest state, as a view into the slot that the next push may overwrite
+        if not self.count: return None
+        self.count -= 1
+        i = (self.start + self.count) % self.capacity
+        offset = i * self.slot_size
+        return self.view[offset:offset + self.lengths[i]]
+
+    def clear(self):
+        self.start = 0
+        self.count = 0
+
+    @property
+    def nbytes(self):
+        return len(self.memory) + self.lengths.itemsize * self.capacity
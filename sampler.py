@@ -0,0 +1,34 @@
+import random
+
+
+class AliasTable:
+    #Vose's alias method: O(n) to build, one uniform draw and O(1) work per sample
+    def __init__(self, weights):
+        self.values = list(weights)
+        self.n = len(self.values)
+        total = sum(weights.values())
+        self.dist = {value: weights[value] / total for value in self.values}
+
+        scaled = [self.dist[value] * self.n for value in self.values]
+        self.prob = [1.0] * self.n
+        self.alias = list(range(self.n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] += scaled[s] - 1
+            if scaled[l] < 1: small.append(l)
+            else: large.append(l)
+
+    def pick(self, u):
+        #u is a uniform draw in [0, 1)
+        u *= self.n
+        i = int(u)
+        if u - i < self.prob[i]: return self.values[i]
+        return self.values[self.alias[i]]
+
+    def sample(self, rng=random):
+        return self.pick(rng.random())
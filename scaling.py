@@ -0,0 +1,99 @@
+import pygame, math, weakref
+
+SCALE_NEAREST, SCALE_SMOOTH, SCALE_PRESCALED = 'nearest', 'smooth', 'prescaled'
+
+
+def fit_scale(size, margin=0.9):
+    #largest integer factor that keeps the window inside the desktop
+    desktop_w, desktop_h = pygame.display.get_desktop_sizes()[0]
+    return max(1, int(min(desktop_w * margin / size[0], desktop_h * margin / size[1])))
+
+
+class ScaleStage:
+    #scenes draw on a logical surface that is scaled onto the window once per frame
+    def __init__(self, window, size, smooth=False):
+        self.window = window
+        self.surface = pygame.Surface(size).convert(window)
+        self.smooth = smooth
+        self.sx = window.get_width() / size[0]
+        self.sy = window.get_height() / size[1]
+        self.bounds = self.surface.get_rect()
+
+    def to_window(self, rect):
+        left, top = math.floor(rect.left * self.sx), math.floor(rect.top * self.sy)
+        return pygame.Rect(left, top, math.ceil(rect.right * self.sx) - left, math.ceil(rect.bottom * self.sy) - top)
+
+    def present(self, rects):
+        #smoothing samples neighbouring pixels, so it always scales the whole frame
+        if rects is None or self.smooth:
+            scale = pygame.transform.smoothscale if self.smooth else pygame.transform.scale
+            scale(self.surface, self.window.get_size(), self.window)
+            pygame.display.flip()
+            return
+
+        window_rects = []
+        for rect in rects:
+            rect = rect.clip(self.bounds)
+            if not rect: continue
+            window_rect = self.to_window(rect)
+            pygame.transform.scale(self.surface.subsurface(rect), window_rect.size, self.window.subsurface(window_rect))
+            window_rects.append(window_rect)
+        pygame.display.update(window_rects)
+
+
+class FrameCache:
+    #frames scaled once per integer factor, dropped with the frame they were made from
+    def __init__(self, factor):
+        self.factor = factor
+        self.frames = weakref.WeakKeyDictionary()
+
+    def get(self, surface):
+        scaled = self.frames.get(surface)
+        if scaled is None:
+            scaled = self.frames[surface] = pygame.transform.scale_by(surface, self.factor)
+        return scaled
+
+
+class ScaledCanvas:
+    #stands in for the screen: logical coordinates go straight to the window using pre-scaled frames
+    def __init__(self, window, factor):
+        self.window = window
+        self.factor = factor
+        self.rect = pygame.Rect(0, 0, window.get_width() // factor, window.get_height() // factor)
+        self.cache = FrameCache(factor)
+
+    def get_rect(self, **kwargs):
+        rect = self.rect.copy()
+        for name, value in kwargs.items(): setattr(rect, name, value)
+        return rect
+
+    def get_size(self): return self.rect.size
+    def get_width(self): return self.rect.width
+    def get_height(self): return self.rect.height
+
+    def to_window(self, rect):
+        f = self.factor
+        return pygame.Rect(rect.x * f, rect.y * f, rect.width * f, rect.height * f)
+
+    def to_logical(self, rect):
+        f = self.factor
+        left, top = rect.x // f, rect.y // f
+        return pygame.Rect(left, top, -(-rect.right // f) - left, -(-rect.bottom // f) - top)
+
+    def fill(self, color, rect=None, special_flags=0):
+        if rect is None: rect = self.rect
+        return self.to_logical(self.window.fill(color, self.to_window(pygame.Rect(rect)), special_flags))
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        f = self.factor
+        x, y = dest[0], dest[1]
+        if area is not None: area = self.to_window(pygame.Rect(area))
+        return self.to_logical(self.window.blit(self.cache.get(source), (x * f, y * f), area, special_flags))
+
+    def blits(self, blit_sequence, doreturn=1):
+        rects = [self.blit(*item) for item in blit_sequence]
+        if doreturn: return rects
+
+    def present(self, rects):
+        if rects is None: pygame.display.flip()
+        else: pygame.display.update([self.to_window(rect) for rect in rects])
@@ -0,0 +1,102 @@
+import os, json, time, queue, threading, atexit, functools
+
+HIGH_SCORE_FILE = './assets/high_score.txt'
+LEADERBOARD_FILE = './assets/leaderboard.json'
+LEADERBOARD_SIZE = 10
+
+
+def atomic_write(filename, data):
+    #readers only ever see the old or the new file, never a half written one
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb' if isinstance(data, bytes) else 'w') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+
+
+def save_file(filename, data):
+    directory = os.path.dirname(filename)
+    if directory: os.makedirs(directory, exist_ok=True)
+    atomic_write(filename, data)
+
+
+def read_high_score(filename):
+    try:
+        with open(filename) as f: return int(f.readline())
+    except (OSError, ValueError):
+        return 0
+
+
+class ScoreStore:
+    def __init__(self, high_score_file=HIGH_SCORE_FILE, leaderboard_file=LEADERBOARD_FILE, size=LEADERBOARD_SIZE):
+        self.high_score_file = high_score_file
+        self.leaderboard_file = leaderboard_file
+        self.size = size
+
+        self.high_score = read_high_score(high_score_file)
+        self.entries = None
+        self.lock = threading.Lock()
+
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def submit(self, score, **metadata):
+        #called from the game loop, the files are written on the writer thread
+        if score > self.high_score: self.high_score = score
+        self.put(functools.partial(self.write, dict(metadata, score=score, date=time.time())))
+
+    def put(self, job):
+        #any other file the game saves, such as a replay, is written by a job on the same thread
+        if not self.thread:
+            self.thread = threading.Thread(target=self.writer, name='score-writer', daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+        self.queue.put(job)
+
+    def leaderboard(self):
+        with self.lock:
+            if self.entries is None: self.load()
+            return list(self.entries)
+
+    def load(self):
+        try:
+            with open(self.leaderboard_file) as f: self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = []
+
+    def writer(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None: return
+                job()
+            finally:
+                self.queue.task_done()
+
+    def write(self, entry):
+        with self.lock:
+            if self.entries is None: self.load()
+            self.entries.append(entry)
+            self.entries.sort(key=lambda e: -e['score'])
+            del self.entries[self.size:]
+            entries = list(self.entries)
+
+        atomic_write(self.leaderboard_file, json.dumps(entries, indent=1))
+        if entry['score'] >= read_high_score(self.high_score_file):
+            atomic_write(self.high_score_file, str(entry['score']))
+
+    def flush(self):
+        if self.thread: self.queue.join()
+
+    def close(self):
+        if not self.thread: return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+
+if __name__ == '__main__':
+    for i, entry in enumerate(ScoreStore().leaderboard()):
+        print('%2d. %6d  %s  seed %s  %.0fs' % (i + 1, entry['score'], time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['date'])),
+                                          entry.get('seed'), entry.get('duration', 0)))
@@ -0,0 +1,254 @@
+import asyncio, argparse, collections, struct, threading, time
+
+SPECTATOR_PORT = 8765
+
+#tick, baseline tick (FULL for a keyframe), publish time, view offset, score,
+#player x, y, image, flags, hat frame, changed entities, removed entities
+HEADER = struct.Struct('<IIdiIhhBBBHH')
+#entity id, kind, frame, world x, world y
+ENTITY = struct.Struct('<IBBhi')
+REMOVED = struct.Struct('<I')
+LENGTH = struct.Struct('<I')
+ACK = struct.Struct('<I')
+
+FULL = 0xFFFFFFFF
+BOOSTING = 1
+
+#platform classes by name, so this module doesn't need to import the game
+KINDS = {'BoucePlatform': 0, 'StillPlatform': 1, 'MovingPlatform': 2, 'BreakablePlatform': 3,
+         'CloudPlatorm': 4, 'SpikeMovingPlatform': 5, 'Hat': 6}
+HAT = KINDS['Hat']
+
+Snapshot = collections.namedtuple('Snapshot', 'tick stamp game view score player entities')
+
+
+def frame_of(sprite):
+    animation = getattr(sprite, 'animation', None)
+    if animation: return int(animation.frame_index) % len(animation.frames)
+    clock = getattr(sprite, 'clock', None)
+    if not clock: return 0
+    frozen = getattr(sprite, 'frozen', None)
+    if frozen is not None: return clock.frames.index(frozen)
+    return int(clock.frame_index) % len(clock.frames)
+
+
+def capture(game, tick):
+    order = game.platforms.order
+    entities = {order[sprite]: (KINDS[type(sprite).__name__], frame_of(sprite), sprite.rect.x, sprite.rect.y)
+                for sprite in order}
+
+    player = game.player.sprite
+    image = 2 if player.image is player.facing_front else 1 if player.image is player.facing_right else 0
+    hat_frame = frame_of(player.hat) if player.is_boosting else 0
+    state = (player.rect.x, player.rect.y, image, BOOSTING if player.is_boosting else 0, hat_frame)
+    return Snapshot(tick, time.perf_counter(), id(game), game.view_offset(), game.score, state, entities)
+
+
+def encode(snapshot, baseline=None):
+    entities = snapshot.entities
+    if baseline is None:
+        changed, removed = entities.items(), ()
+    else:
+        previous = baseline.entities
+        changed = [(key, entity) for key, entity in entities.items() if previous.get(key) != entity]
+        removed = [key for key in previous if key not in entities]
+
+    parts = [HEADER.pack(snapshot.tick, FULL if baseline is None else baseline.tick, snapshot.stamp, snapshot.view,
+                         snapshot.score, *snapshot.player, len(changed), len(removed))]
+    parts += [ENTITY.pack(key, *entity) for key, entity in changed]
+    parts += [REMOVED.pack(key) for key in removed]
+    payload = b''.join(parts)
+    return LENGTH.pack(len(payload)) + payload
+
+
+class Spectator:
+    def __init__(self, writer):
+        self.writer = writer
+        self.ack = None
+
+
+class SpectatorServer:
+    #snapshots are taken on the game thread, encoding and sending happen on the server's own event loop
+    def __init__(self, host='0.0.0.0', port=SPECTATOR_PORT, history=64, max_buffer=256 * 1024):
+        self.host = host
+        self.port = port
+        self.max_buffer = max_buffer
+        self.history = collections.OrderedDict()
+        self.history_size = history
+
+        self.spectators = set()
+        self.connections = set()
+        self.tick = 0
+        self.game = None
+        self.sent = 0
+        self.dropped = 0
+
+        self.loop = None
+        self.ready = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=asyncio.run, args=(self.serve(),), name='spectator-server', daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopped = asyncio.Event()
+        server = await asyncio.start_server(self.on_connect, self.host, self.port)
+        #port 0 picks a free port
+        self.port = server.sockets[0].getsockname()[1]
+        self.ready.set()
+        async with server:
+            await self.stopped.wait()
+            for spectator in list(self.spectators): spectator.writer.close()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+
+    def stop(self):
+        if self.loop: self.loop.call_soon_threadsafe(self.stopped.set)
+        if self.thread: self.thread.join()
+
+    async def on_connect(self, reader, writer):
+        spectator = Spectator(writer)
+        self.spectators.add(spectator)
+        self.connections.add(asyncio.current_task())
+        try:
+            while True:
+                tick, = ACK.unpack(await reader.readexactly(ACK.size))
+                if spectator.ack is None or tick > spectator.ack: spectator.ack = tick
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.spectators.discard(spectator)
+            self.connections.discard(asyncio.current_task())
+            writer.close()
+
+    def publish(self, game):
+        #called once per tick from the game loop, never blocks on the network
+        if not self.spectators: return
+        self.tick += 1
+        self.loop.call_soon_threadsafe(self.broadcast, capture(game, self.tick))
+
+    def broadcast(self, snapshot):
+        if snapshot.game != self.game:
+            #entity ids restart with every game, nothing older can be a baseline
+            self.game = snapshot.game
+            self.history.clear()
+        self.history[snapshot.tick] = snapshot
+        if len(self.history) > self.history_size: self.history.popitem(last=False)
+
+        encoded = {}
+        for spectator in self.spectators:
+            transport = spectator.writer.transport
+            if transport.is_closing(): continue
+            #a spectator that can't keep up skips ticks, its next delta covers them
+            if transport.get_write_buffer_size() > self.max_buffer:
+                self.dropped += 1
+                continue
+            baseline = self.history.get(spectator.ack)
+            key = baseline.tick if baseline else None
+            data = encoded.get(key)
+            if data is None: data = encoded[key] = encode(snapshot, baseline)
+            spectator.writer.write(data)
+            self.sent += len(data)
+
+
+class SpectatorState:
+    #the scene as rebuilt from the stream, kept for a few ticks to apply deltas against older baselines
+    def __init__(self, history=64):
+        self.states = collections.OrderedDict()
+        self.history = history
+        self.tick = None
+        self.header = None
+        self.entities = {}
+
+    def apply(self, payload):
+        header = HEADER.unpack_from(payload)
+        tick, baseline, stamp, view, score, px, py, image, flags, hat_frame, n_changed, n_removed = header
+        if baseline == FULL: entities = {}
+        elif baseline in self.states: entities = dict(self.states[baseline])
+        else: return None
+
+        offset = HEADER.size
+        for key, kind, frame, x, y in ENTITY.iter_unpack(payload[offset:offset + n_changed * ENTITY.size]):
+            entities[key] = (kind, frame, x, y)
+        offset += n_changed * ENTITY.size
+        for key, in REMOVED.iter_unpack(payload[offset:offset + n_removed * REMOVED.size]):
+            del entities[key]
+
+        self.tick, self.header, self.entities = tick, header, entities
+        self.states[tick] = entities
+        if len(self.states) > self.history: self.states.popitem(last=False)
+        return tick
+
+
+async def spectate(host, port, on_tick=None, duration=None):
+    reader, writer = await asyncio.open_connection(host, port)
+    state = SpectatorState()
+    deadline = duration and time.perf_counter() + duration
+    try:
+        while not deadline or time.perf_counter() < deadline:
+            length, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+            payload = await reader.readexactly(length)
+            tick = state.apply(payload)
+            if tick is None: continue
+            writer.write(ACK.pack(tick))
+            if on_tick: on_tick(state, length + LENGTH.size)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+    return state
+
+
+class SceneRenderer:
+    def __init__(self, kind_frames, player_frames, hat_frames):
+        self.kind_frames = kind_frames
+        self.player_frames = player_frames
+        self.hat_frames = hat_frames
+
+    def render(self, screen, state):
+        tick, baseline, stamp, view, score, px, py, image, flags, hat_frame, *counts = state.header
+        screen.fill('white')
+        screen.blits([(self.kind_frames[kind][frame], (x, y - view)) for kind, frame, x, y in state.entities.values()], 0)
+        player = self.player_frames[image]
+        screen.blit(player, (px, py))
+        if flags & BOOSTING:
+            hat = self.hat_frames[hat_frame]
+            rect = hat.get_rect(center=(px + player.get_width() // 2, py + player.get_height() // 2 - 12))
+            screen.blit(hat, rect)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch a game streamed by SpectatorServer')
+    parser.add_argument('address', nargs='?', default='127.0.0.1:%d' % SPECTATOR_PORT)
+    parser.add_argument('--headless', action='store_true', help='rebuild the scene without a window and print stream stats')
+    parser.add_argument('--duration', type=float)
+    args = parser.parse_args()
+    host, port = args.address.rsplit(':', 1)
+
+    import os
+    if args.headless: os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from whirlybird import pygame, WINDOW_SIZE, PLATFORM_SHEETS, assets
+
+    pygame.init()
+    screen = pygame.display.set_mode(WINDOW_SIZE)
+    renderer = SceneRenderer([assets[name] for name in PLATFORM_SHEETS],
+                             (assets['player'][0], assets['player_right'][0], assets['pl_front'][0]), assets['hat'])
+    stats = {'ticks': 0, 'bytes': 0, 'start': time.perf_counter()}
+
+    def on_tick(state, size):
+        stats['ticks'] += 1
+        stats['bytes'] += size
+        pygame.event.pump()
+        renderer.render(screen, state)
+        pygame.display.flip()
+
+    asyncio.run(spectate(host, int(port), on_tick, args.duration))
+    elapsed = time.perf_counter() - stats['start']
+    print('%d ticks, %.1f KB/s' % (stats['ticks'], stats['bytes'] / elapsed / 1024))
+
+
+if __name__ == '__main__':
+    main()
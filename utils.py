@@ -1,7 +1,12 @@
-import pygame, random
+import pygame, random, collections, os, queue, threading, time
+from profiler import *
+from scaling import *
+from pipeline import *
+from hud import fonts
+from bundle import AssetBundle, BUNDLE_PATH
 
-def outcome(dist):
-    r = random.random()
+def outcome(dist, rng=random):
+    r = rng.random()
     cum_prob = 0
     for value, prob in dist.items():
         cum_prob += prob
@@ -19,9 +24,11 @@ def normalize(weights):
     return new_dist
 
 def load_animation(filename, frame_height):
+    return split_frames(pygame.image.load(filename), frame_height)
+
+def split_frames(frames_img, frame_height):
     frames = []
 
-    frames_img = pygame.image.load(filename)
     frame_width, total_height = frames_img.get_rect().size
     
     n_rows = total_height // frame_height
@@ -36,6 +43,123 @@ def load_animation(filename, frame_height):
     return frames
 
 
+class Frames:
+    #the frames of one sheet, decoded the first time one of them is used
+    def __init__(self, assets, name):
+        self.assets = assets
+        self.name = name
+        self.frames = None
+
+    def load(self):
+        if self.frames is None: self.frames = self.assets.decode(self.name)
+        return self.frames
+
+    def __getitem__(self, i):
+        frames = self.frames
+        if frames is None: frames = self.load()
+        return frames[i]
+
+    def __len__(self):
+        if self.frames is None: return self.assets.frame_count(self.name)
+        return len(self.frames)
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def index(self, frame):
+        return self.load().index(frame)
+
+
+class AssetManager:
+    #the registry of sprite sheets by name, read from the prebuilt bundle when it matches the png
+    def __init__(self, atlas_width=256, bundle_path=BUNDLE_PATH):
+        self.atlas_width = atlas_width
+        self.bundle_path = bundle_path
+        self.bundle = None
+        self.entries = {}
+        self.sources = {}
+        self.sheets = {}
+        self.frames = {}
+        self.atlas = None
+        self.origins = {}
+
+    def __getitem__(self, name):
+        return self.frames[name]
+
+    def load(self, name, filename, frame_height=None, flip_x=False):
+        #only registers the sheet, nothing is read until one of its frames is used
+        self.sources[name] = (filename, frame_height, flip_x)
+        self.frames[name] = Frames(self, name)
+        return self.frames[name]
+
+    def bundled(self, name):
+        if name not in self.entries:
+            if self.bundle is None and self.bundle_path and os.path.exists(self.bundle_path):
+                self.bundle = AssetBundle(self.bundle_path)
+            self.entries[name] = self.bundle and self.bundle.entry(name, *self.sources[name])
+        return self.entries[name]
+
+    def decode(self, name):
+        filename, frame_height, flip_x = self.sources[name]
+        if self.bundled(name):
+            sheet, frame_height = self.bundle.sheet(name)
+        else:
+            sheet = pygame.image.load(filename)
+            if flip_x: sheet = pygame.transform.flip(sheet, True, False)
+            if frame_height is None: frame_height = sheet.get_height()
+
+        self.sheets[name] = (sheet, frame_height)
+        if self.atlas is not None: return self.place(name)
+        return split_frames(sheet, frame_height)
+
+    def frame_size(self, name):
+        #the bundle index knows sizes without decoding anything
+        entry = self.bundled(name)
+        if entry: return entry['size'][0], entry['frame_height']
+        return self.frames[name][0].get_size()
+
+    def frame_count(self, name):
+        entry = self.bundled(name)
+        if entry: return entry['size'][1] // entry['frame_height']
+        return len(self.frames[name].load())
+
+    def sheet_size(self, name):
+        entry = self.bundled(name)
+        if entry: return tuple(entry['size'])
+        self.frames[name].load()
+        return self.sheets[name][0].get_size()
+
+    def pack(self):
+        #the layout only needs sheet sizes, a sheet is copied into the atlas the first time one of its frames is used
+        sizes = {name: self.sheet_size(name) for name in self.sources}
+
+        #shelf packing, tallest sheets first
+        origins = {}
+        x = y = shelf_height = 0
+        for name, (width, height) in sorted(sizes.items(), key=lambda item: -item[1][1]):
+            if x + width > self.atlas_width:
+                x, y, shelf_height = 0, y + shelf_height, 0
+            origins[name] = (x, y)
+            x += width
+            shelf_height = max(shelf_height, height)
+
+        atlas = pygame.Surface((self.atlas_width, y + shelf_height), pygame.SRCALPHA)
+        if pygame.display.get_surface(): atlas = atlas.convert_alpha()
+        self.atlas, self.origins = atlas, origins
+
+        for frames in self.frames.values():
+            #frame lists are updated in place so animations that already hold them see the atlas
+            if frames.frames is not None: frames.frames[:] = self.place(frames.name)
+        return atlas
+
+    def place(self, name):
+        sheet, frame_height = self.sheets[name]
+        rect = self.atlas.blit(sheet, self.origins[name], special_flags=pygame.BLEND_RGBA_MAX)
+        return split_frames(self.atlas.subsurface(rect), frame_height)
+
+assets = AssetManager()
+
+
 
 class Animation:
     def __init__(self, frames, frame_speed):
@@ -44,20 +168,74 @@ class Animation:
         self.frame_index = 0
         self.current_frame = self.frames[int(self.frame_index)]
 
-    def next_frame(self):
-        self.frame_index += self.frame_speed
-        if self.frame_index > len(self.frames): self.frame_index -= len(self.frames)
+    def reset(self):
+        self.frame_index = 0
+        self.current_frame = self.frames[0]
+
+    def seek(self, frame_index):
+        self.frame_index = frame_index
+        self.current_frame = self.frames[int(frame_index)]
+        return self.current_frame
+
+    def next_frame(self, step=1):
+        self.frame_index += self.frame_speed * step
+        #a long step can land exactly on, or past, the end of the loop
+        if self.frame_index >= len(self.frames): self.frame_index %= len(self.frames)
         self.current_frame = self.frames[int(self.frame_index)]
         return self.current_frame
 
 
+class LazyAnimation:
+    #a class level animation that is only built, and its frames decoded, when it is first used
+    def __init__(self, frames, frame_speed):
+        self.frames = frames
+        self.frame_speed = frame_speed
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        animation = Animation(self.frames, self.frame_speed)
+        setattr(owner, self.name, animation)
+        return animation
+
+
+class AnimationSystem:
+    def __init__(self, loops):
+        #looping animations get one clock per sprite type, stepped once per tick for all of them
+        self.clocks = {key: Animation(frames, frame_speed) for key, (frames, frame_speed) in loops.items()}
+        #one-shot animations are stepped only while they play
+        self.active = {}
+
+    def play(self, sprite):
+        self.active[sprite] = None
+
+    def update(self, step=1):
+        for clock in self.clocks.values(): clock.next_frame(step)
+        if self.active:
+            for sprite in list(self.active):
+                if not sprite.animate(step): del self.active[sprite]
+
+
+class Scene:
+    #whoever shows a scene calls enter when it comes up, exit when it is replaced and dispose once nothing will use it
+    def enter(self): pass
+
+    def exit(self):
+        #a replaced scene can no longer call back into its owner
+        self.callback = None
+
+    def dispose(self): pass
+
+
 class EventSystem:
     def __init__(self):
 
         self.subscribers = {
             pygame.QUIT : [],
             pygame.MOUSEBUTTONDOWN: [],
-            pygame.KEYDOWN : []
+            pygame.KEYDOWN : [],
+            pygame.WINDOWEXPOSED : []
         }
         EventSystem.TIMEOUT_EVENT =  self.add_event()
 
@@ -79,40 +257,286 @@ class EventSystem:
         self.subscribers[eventype].remove(handler)
 
     def dispatch(self):
-        for event in pygame.event.get():
-            if event.type in self.subscribers:
-                for handler in self.subscribers[event.type]:
-                    handler(event)    
+        events = pygame.event.get()
+        for event in events: self.handle(event)
+        return len(events)
+
+    def handle(self, event):
+        if event.type in self.subscribers:
+            for handler in self.subscribers[event.type]:
+                handler(event)
 
 
 class Engine:
-    def __init__(self, size):
+    #longest frame the simulation tries to catch up on, and the most ticks run per rendered frame
+    MAX_FRAME_TIME = 0.25
+    MAX_CATCH_UP = 5
+    #longest sleep waiting for an event while the scene has nothing to redraw
+    IDLE_WAIT = 0.5
+    #input to photon latencies kept for latency_stats
+    LATENCY_SAMPLES = 1000
+
+    def __init__(self, size, frame_rate=60, max_fps=None, idle_wait=IDLE_WAIT, scale=1, scale_mode=SCALE_NEAREST,
+                 pipelined=False, max_latency=MAX_LATENCY):
         pygame.init()
-        self.screen = pygame.display.set_mode(size)
+        #scenes always draw at the logical size, scale None fits the window to the desktop
+        if scale is None: scale = fit_scale(size)
+        self.scale = scale
+        self.window = pygame.display.set_mode((round(size[0] * scale), round(size[1] * scale)))
+        self.stage = None
+        if scale == 1: self.screen = self.window
+        elif scale_mode == SCALE_PRESCALED: self.screen = self.stage = ScaledCanvas(self.window, int(scale))
+        else:
+            self.stage = ScaleStage(self.window, size, scale_mode == SCALE_SMOOTH)
+            self.screen = self.stage.surface
+        assets.pack()
         self.clk = pygame.time.Clock()
         self.event_system = EventSystem()
         self.scene = None
         self.running = True
-        self.window_rect = pygame.display.get_surface().get_rect()
+        self.window_rect = self.screen.get_rect()
 
         self.event_system.subscribe(self.on_quit, pygame.QUIT)
+        #subscribed before any scene, so handlers further down see logical positions
+        self.event_system.subscribe(self.on_mouse, pygame.MOUSEBUTTONDOWN)
 
-        self.frame_rate = 60
+        self.frame_rate = frame_rate
+        #frames are paced apart from the fixed timestep, at the tick rate unless asked otherwise, 0 is uncapped
+        self.max_fps = frame_rate if max_fps is None else max_fps
 
         self.dt = 1/self.frame_rate
+        self.dropped_time = 0
+
+        #scenes without a dirty attribute are redrawn every frame
+        self.idle_wait = idle_wait
+        self.exposed = True
+        self.event_system.subscribe(self.on_exposed, pygame.WINDOWEXPOSED)
+        #process time, wall time and frames drawn per scene mode
+        self.usage = collections.defaultdict(lambda: [0.0, 0.0, 0])
+
+        self.profiler = profiler
+        self.overlay = None
+        self.event_system.subscribe(self.on_key, pygame.KEYDOWN)
+
+        #pipelined runs the simulation on a worker thread and only replays its draw calls and flips on this one
+        self.pipelined = pipelined
+        self.max_latency = max_latency
+        self.failure = None
+        #seconds from reading an input to the flip of the first frame drawn after it, and frames presented
+        self.latencies = collections.deque(maxlen=self.LATENCY_SAMPLES)
+        self.presented = 0
+        self.replaced = 0
 
     def on_quit(self, event):
         self.running = False
 
+    def on_mouse(self, event):
+        event.pos = self.to_logical(event.pos)
+
+    def to_logical(self, pos):
+        return int(pos[0] / self.scale), int(pos[1] / self.scale)
+
+    def on_exposed(self, event):
+        self.exposed = True
+
+    def cpu_usage(self):
+        return {mode: cpu / wall for mode, (cpu, wall, frames) in self.usage.items() if wall}
+
+    def on_key(self, event):
+        if event.key == pygame.K_F3:
+            self.profiler.toggle()
+        elif event.key == pygame.K_F4:
+            self.export_profile(time.strftime('profile-%Y%m%d-%H%M%S'))
+
+    def export_profile(self, basename):
+        self.profiler.export_csv(basename + '.csv')
+        self.profiler.export_json(basename + '.json')
+
+    def draw_overlay(self):
+        if not self.overlay: self.overlay = ProfilerOverlay(self.profiler, fonts.get('Courier', 14))
+        return self.overlay.draw(self.screen)
+
+    def latency_stats(self):
+        if not self.latencies: return None
+        latencies = sorted(self.latencies)
+        return sum(latencies) / len(latencies), latencies[len(latencies) // 2], latencies[int(0.95 * (len(latencies) - 1))]
+
     def mainloop(self):
+        if self.pipelined: return self.pipelined_loop()
+        profiler = self.profiler
+        accumulator = 0
+        previous = time.perf_counter()
+        inputs = None
         while self.running:
-            self.event_system.dispatch()
-            self.scene.update(self.dt)
-            self.scene.draw(self.screen)
-            pygame.display.flip()
-            self.clk.tick(60)
+            if profiler.enabled: profiler.begin_frame()
+            mode = getattr(self.scene, 'mode', 'scene')
+            cpu_start = time.process_time()
+            now = time.perf_counter()
+            accumulator += min(now - previous, self.MAX_FRAME_TIME)
+            previous = now
+
+            if self.event_system.dispatch() and inputs is None: inputs = now
+            if profiler.enabled: profiler.lap(DISPATCH)
+
+            ticks = 0
+            while accumulator >= self.dt:
+                if ticks == self.MAX_CATCH_UP:
+                    #spiral of death guard: drop the backlog instead of falling further behind
+                    self.dropped_time += accumulator - accumulator % self.dt
+                    accumulator %= self.dt
+                    break
+                self.scene.update(self.dt)
+                accumulator -= self.dt
+                ticks += 1
+
+            if profiler.enabled: profiler.lap(UPDATE_OTHER)
+
+            if self.idle_wait and not self.exposed and not profiler.enabled and not getattr(self.scene, 'dirty', True):
+                #nothing changed on screen: sleep until an event instead of redrawing at the frame rate
+                event = pygame.event.wait(int(1000 * self.idle_wait))
+                if event.type != pygame.NOEVENT:
+                    self.event_system.handle(event)
+                    if inputs is None: inputs = time.perf_counter()
+                #time spent asleep is not simulation time to catch up on
+                previous = time.perf_counter()
+                self.account(mode, cpu_start, now, 0)
+                continue
+            self.exposed = False
+
+            rects = self.scene.draw(self.screen, accumulator / self.dt)
+            if profiler.enabled:
+                overlay_rect = self.draw_overlay()
+                if rects is not None: rects.append(overlay_rect)
+                profiler.lap(DRAW)
+
+            self.present(rects)
+            self.presented += 1
+            if inputs is not None:
+                self.latencies.append(time.perf_counter() - inputs)
+                inputs = None
+            if profiler.enabled: profiler.lap(FLIP)
+
+            self.clk.tick(self.max_fps)
+            if profiler.enabled:
+                profiler.lap(IDLE)
+                profiler.end_frame()
+            self.account(mode, cpu_start, now, 1)
         pygame.quit()
 
+    def pipelined_loop(self):
+        #SDL wants the window and its event queue on the thread that made them, so this thread reads events,
+        #replays frames and flips while the simulation ticks and records its draw calls on a worker
+        events = queue.SimpleQueue()
+        frames = FrameBuffer(self.max_latency)
+        simulation = threading.Thread(target=self.simulate, args=(events, frames), name='simulation', daemon=True)
+        simulation.start()
+        while self.running:
+            batch = pygame.event.get()
+            if batch: events.put((time.perf_counter(), batch))
+            frame = frames.take(self.dt)
+            if frame is None: continue
+            replay(self.screen, frame.ops)
+            self.present(frame.rects)
+            self.presented += 1
+            if frame.inputs is not None: self.latencies.append(time.perf_counter() - frame.inputs)
+            self.clk.tick(self.max_fps)
+        simulation.join()
+        self.replaced = frames.replaced
+        pygame.quit()
+        if self.failure: raise self.failure
+
+    def simulate(self, events, frames):
+        recorder = DrawRecorder(self.screen.get_size())
+        accumulator = 0
+        previous = time.perf_counter()
+        inputs = None
+        try:
+            while self.running:
+                mode = getattr(self.scene, 'mode', 'scene')
+                cpu_start = time.process_time()
+                now = time.perf_counter()
+                accumulator += min(now - previous, self.MAX_FRAME_TIME)
+                previous = now
+
+                while not events.empty():
+                    stamp, batch = events.get()
+                    for event in batch: self.event_system.handle(event)
+                    if inputs is None: inputs = stamp
+
+                ticks = 0
+                while accumulator >= self.dt:
+                    if ticks == self.MAX_CATCH_UP:
+                        self.dropped_time += accumulator - accumulator % self.dt
+                        accumulator %= self.dt
+                        break
+                    self.scene.update(self.dt)
+                    accumulator -= self.dt
+                    ticks += 1
+
+                dirty = self.exposed or getattr(self.scene, 'dirty', True)
+                drawn = 0
+                if dirty and frames.ready():
+                    #back-pressure: while the render thread is behind nothing new is drawn
+                    self.exposed = False
+                    rects = self.scene.draw(recorder, accumulator / self.dt)
+                    if rects is not None: rects = [pygame.Rect(rect) for rect in rects]
+                    frames.put(Frame(recorder.take(), rects, time.perf_counter(), inputs))
+                    inputs = None
+                    drawn = 1
+                #the next frame is drawn once the render thread takes this one, or at the next tick
+                wait = max(self.dt - accumulator - (time.perf_counter() - now), 0)
+                if dirty: frames.wait_taken(wait)
+                else: time.sleep(wait)
+                self.account(mode, cpu_start, now, drawn)
+        except BaseException as e:
+            self.failure = e
+        finally:
+            self.running = False
+
+    def account(self, mode, cpu_start, wall_start, frames):
+        usage = self.usage[mode]
+        usage[0] += time.process_time() - cpu_start
+        usage[1] += time.perf_counter() - wall_start
+        usage[2] += frames
+
+    def present(self, rects):
+        if self.stage: self.stage.present(rects)
+        elif rects is None: pygame.display.flip()
+        else: pygame.display.update(rects)
+
+
+class HeadlessEngine:
+    def __init__(self, size, frame_rate=60):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pygame.init()
+        self.scene = None
+        self.running = True
+        self.window_rect = pygame.Rect((0, 0), size)
+
+        self.frame_rate = frame_rate
+
+        self.dt = 1/self.frame_rate
+        self.steps = 0
+
+    def stop(self):
+        self.running = False
+
+    def run(self, max_steps=None, max_seconds=None):
+        start = time.perf_counter()
+        start_steps = self.steps
+        update = self.scene.update
+        dt = self.dt
+
+        while self.running:
+            if max_steps is not None and self.steps - start_steps >= max_steps: break
+            if max_seconds is not None and not (self.steps - start_steps) % 1000 \
+                    and time.perf_counter() - start >= max_seconds: break
+            update(dt)
+            self.steps += 1
+
+        elapsed = time.perf_counter() - start
+        return self.steps - start_steps, elapsed
+
 def saturate(val, max, min):
     if val > max: return max
     if val < min: return min
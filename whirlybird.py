@@ -1,5 +1,12 @@
-import pygame, random
+import pygame, random, bisect, collections, functools, os, struct, time
 from utils import *
+from hud import *
+from recording import *
+from sampler import *
+from scores import *
+from chunks import *
+from rewind import *
+from leaks import *
 
 WINDOW_SIZE = 400, 600
 
@@ -21,39 +28,92 @@ PLATFORM_SPEED = 1
 
 SCORE_UPDATE = 1
 
-#loading animations
-still_platform = pygame.image.load('./assets/still.png')
-moving_platform = load_animation('./assets/moving.png', 7)
-breckable_platform = load_animation('./assets/break.png', PLATFORM_SIZE[1])
-spike_moving_platform = load_animation('./assets/spike.png', 20)
-cloud_platform = load_animation('./assets/cloud.png', PLATFORM_SIZE[1])
-bounce_platform = load_animation('./assets/bounce.png', 7)
+#speeds, accelerations and timeouts above are per tick at this rate
+TICK_RATE = 60
+
+#platform type odds for the first screen, then the weights each difficulty tier builds on
+START_DIST = {0: 0.4, 1: 0.3, 2: 0.1, 3:0.05, 4: 0.025, 5: 0.025}
+#START_DIST leaves 0.1 unassigned, the first screen has always made those rolls moving platforms
+FIRST_SCREEN_DIST = {**START_DIST, 2: START_DIST[2] + 1 - sum(START_DIST.values())}
+START_WEIGHTS = {0: 20, 1: 15, 2: 10, 3:5, 4: 4, 5: 1}
+DIFFICULTY_STEP = 500
+HAT_CHANCE = 0.1
+
+DIRTY_RECTS = False
+#window size as a multiple of WINDOW_SIZE, None picks the largest that fits the desktop
+WINDOW_SCALE = None
+SCALE_MODE = SCALE_NEAREST
+#port live games are streamed to spectators on, None disables streaming
+SPECTATOR_PORT = None
+#directory that finished runs are recorded to, None disables recording
+REPLAY_DIR = None
+
+#practice runs don't end on death, holding the rewind key steps back one tick per frame
+PRACTICE_MODE = False
+REWIND_SECONDS = 10
+#simulate on a worker thread while the main thread replays the recorded frames and flips
+PIPELINED = False
+#print what every scene switch leaves behind, see leaks.py
+TRACK_SCENES = False
+
+NO_ACTION, MOVE_LEFT, MOVE_RIGHT = 0, 1, 2
+
+
+def tier_weights(tier):
+    #every tier up to this one adds tier * difficulty to each weight
+    return {difficulty: weight + tier * (tier + 1) // 2 * difficulty for difficulty, weight in START_WEIGHTS.items()}
+
+def roll_platform(rng, width=WINDOW_SIZE[0]):
+    #one level record: a uniform the current difficulty turns into a type, the hat roll, the next x
+    #and the roll deciding whether a spike platform, if that is what it becomes, kills the player
+    return rng.random(), rng.random() < HAT_CHANCE, rng.randrange(0, width-PLATFORM_SIZE[0]), rng.random()
+
+#sprite sheets, looked up by name in the asset registry and decoded the first time they are used
+assets.load('still', './assets/still.png')
+assets.load('moving', './assets/moving.png', 7)
+assets.load('break', './assets/break.png', PLATFORM_SIZE[1])
+assets.load('spike', './assets/spike.png', 20)
+assets.load('cloud', './assets/cloud.png', PLATFORM_SIZE[1])
+assets.load('bounce', './assets/bounce.png', 7)
 
 #player
-player_img = pygame.image.load('./assets/player.png')
-pl_front_img = pygame.image.load('./assets/pl_front.png')
+assets.load('player', './assets/player.png')
+assets.load('player_right', './assets/player.png', flip_x=True)
+assets.load('pl_front', './assets/pl_front.png')
 
 #hat
-hat_animation = load_animation('./assets/hat.png', 7)
+assets.load('hat', './assets/hat.png', 7)
+
+
+def keyboard_input():
+    key = pygame.key.get_pressed()
+    if key[pygame.K_d]: return MOVE_RIGHT
+    elif key[pygame.K_a]: return MOVE_LEFT
+    return NO_ACTION
+
+def rewind_input():
+    return pygame.key.get_pressed()[pygame.K_BACKSPACE]
 
 
 class Player(pygame.sprite.Sprite):
 
-    def __init__(self, area_rect, *groups):
+    def __init__(self, area_rect, *groups, input_source=keyboard_input):
         super().__init__(*groups)       
         
         self.area_rect = area_rect
+        self.input_source = input_source
 
-        self.image = player_img
+        self.image = assets['player'][0]
         self.facing_left = self.image
-        self.facing_right = pygame.transform.flip(self.image, True, False)
-        self.facing_front = pl_front_img
+        self.facing_right = assets['player_right'][0]
+        self.facing_front = assets['pl_front'][0]
         self.rect = self.image.get_rect()
 
         self.pos = pygame.math.Vector2(self.area_rect.center)
         self.speed = pygame.math.Vector2((0,0))
         
         self.rect.center  = self.pos
+        self.previous_pos = pygame.math.Vector2(self.pos)
 
         self.is_boosting = False
         self.time_boosting = 0 
@@ -61,8 +121,10 @@ class Player(pygame.sprite.Sprite):
 
         self.falling_time = 0
 
-    def update(self):
-        self.process_input()
+    def update(self, dt=1/TICK_RATE):
+        step = dt * TICK_RATE
+        self.previous_pos.update(self.pos)
+        self.process_input(step)
 
         if self.is_boosting:
             self.hat.rect.centerx = self.rect.centerx
@@ -75,16 +137,16 @@ class Player(pygame.sprite.Sprite):
                 self.speed.y = 0
                 self.image = self.facing_right
                 self.hat.kill()
-            else : self.time_boosting += 1
+            else : self.time_boosting += step
         else:    
-            self.speed.y += GRAVITY 
+            self.speed.y += GRAVITY * step
 
         self.speed.y = min(self.speed.y, 10)
 
-        self.pos += self.speed 
+        self.pos += self.speed * step
         self.rect.center  = self.pos
 
-        if self.speed.y > 0: self.falling_time += 1
+        if self.speed.y > 0: self.falling_time += step
         else: self.falling_time = 0
 
         self.keep_in_area()
@@ -109,22 +171,46 @@ class Player(pygame.sprite.Sprite):
 
         self.rect.center = self.pos
             
-    def process_input(self):
-        key = pygame.key.get_pressed()
-        if key[pygame.K_d]:
-            self.pos.x += SPEED_INCREASE
+    def render_rect(self, alpha):
+        rect = self.rect.copy()
+        delta = self.pos - self.previous_pos
+        #wrapping around the screen edge is a jump, not motion to interpolate
+        if abs(delta.x) < self.area_rect.width / 2:
+            rect.center = self.previous_pos + delta * alpha
+        return rect
+
+    def process_input(self, step=1):
+        action = self.input_source()
+        if action == MOVE_RIGHT:
+            self.pos.x += SPEED_INCREASE * step
             if not self.is_boosting: self.image = self.facing_right
-        elif key[pygame.K_a]:
-            self.pos.x -= SPEED_INCREASE
+        elif action == MOVE_LEFT:
+            self.pos.x -= SPEED_INCREASE * step
             if not self.is_boosting: self.image = self.facing_left
 
         
 
 class Platform(pygame.sprite.Sprite):
+    static_y = True
+    one_shot = False
+
     def __init__(self,  *groups):
         super().__init__(*groups)
 
         self.callbacks = []
+        self.pool = None
+
+    def reset(self):
+        self.unwire()
+
+    def unwire(self):
+        #drops the links to the player, the game and other platforms that Game.wire and hats make
+        self.callbacks.clear()
+
+    def kill(self):
+        alive = self.alive()
+        super().kill()
+        if alive and self.pool: self.pool.release(self)
     
     def handle_collision(self):
         for callback in self.callbacks: callback()
@@ -133,51 +219,83 @@ class StillPlatform(Platform):
      def __init__(self, initial_pos,*groups):
         super().__init__(*groups)
 
-        self.image = still_platform
+        self.image = assets['still'][0]
         self.rect = self.image.get_rect()
 
+        self.reset(initial_pos)
+
+     def reset(self, initial_pos):
+        super().reset()
         self.rect.bottomleft = initial_pos
 
 class MovingPlatform(Platform):
+    #Game swaps in its own clock, this one only serves sprites created outside a game
+    clock = LazyAnimation(assets['moving'], 0.05)
+
     def __init__(self, area_rect, initial_pos, *groups):
         super().__init__( *groups)
 
-        self.animation = Animation(moving_platform, 0.05)
-
-        self.image = self.animation.current_frame
         self.rect = self.image.get_rect()
+        #the rect is rounded from a float center, so steps shorter than a tick still add up
+        self.pos = pygame.math.Vector2()
+
+        self.reset(area_rect, initial_pos)
+
+    @property
+    def image(self):
+        return self.clock.current_frame
+
+    def reset(self, area_rect, initial_pos):
+        super().reset()
         self.rect.bottomleft = initial_pos
+        self.pos.update(self.rect.center)
         
         self.area_rect = area_rect
         self.speedx = PLATFORM_SPEED
 
+    def move_to(self, center):
+        self.pos.update(center)
+        self.rect.center = self.pos
+
+    def unwire(self):
+        super().unwire()
         self.hat = None
     
-    def update(self):
+    def update(self, dt=1/TICK_RATE):
+        step = dt * TICK_RATE
 
-        self.rect.centerx += self.speedx
-        if self.hat: self.hat.rect.centerx = self.rect.centerx
+        self.move_to((self.pos.x + self.speedx * step, self.pos.y))
+        #a recycled hat may already belong to another platform
+        if self.hat and self.hat.carrier is self: self.hat.rect.centerx = self.rect.centerx
         self.collide_with_walls()
 
-        self.image = self.animation.next_frame()
-
     def collide_with_walls(self):
         if self.rect.right > self.area_rect.right:
             self.rect.right = self.area_rect.right
+            self.pos.x = self.rect.centerx
             self.speedx *= -1
 
         elif self.rect.left < self.area_rect.left:
             self.rect.left = self.area_rect.left
+            self.pos.x = self.rect.centerx
             self.speedx *= -1
 
 class BreakablePlatform(Platform):
+    one_shot = True
+
     def __init__(self, initial_pos,*groups):
         super().__init__( *groups)
-        self.animation = Animation(breckable_platform, 0.08)
+        self.animation = Animation(assets['break'], 0.08)
 
         self.image = self.animation.current_frame
         self.rect = self.image.get_rect()
 
+        self.reset(initial_pos)
+
+    def reset(self, initial_pos):
+        super().reset()
+        self.animation.reset()
+        self.image = self.animation.current_frame
         self.rect.bottomleft = initial_pos
 
         self.collided = False
@@ -187,53 +305,82 @@ class BreakablePlatform(Platform):
             super().handle_collision()
             self.collided = True
 
-    def update(self):
-        if self.collided:
-            if self.animation.frame_index < len(self.animation.frames)-1: 
-                self.image = self.animation.next_frame()
-            else: self.kill()
+    def animate(self, step):
+        #a platform recycled since the collision has nothing left to play
+        if not self.collided: return False
+        if self.animation.frame_index < len(self.animation.frames)-1:
+            self.image = self.animation.next_frame(step)
+            return True
+        self.kill()
+        return False
 
 class SpikeMovingPlatform(MovingPlatform):
-    def __init__(self, area_rect, initial_pos, *groups):
-        super().__init__(area_rect, initial_pos, *groups)
+    roll = 0.0
+    clock = LazyAnimation(assets['spike'], 0.08)
+    frozen = None
 
-        self.animation = Animation(spike_moving_platform, 0.08)
+    def __init__(self, area_rect, initial_pos, *groups):
+        Platform.__init__(self, *groups)
 
-        self.image = self.animation.current_frame
         self.rect = self.image.get_rect()
-        self.rect.bottomleft = initial_pos
+        self.pos = pygame.math.Vector2()
 
-        self.speedy = 0
         self.callbacks = {'spike_out': None, 'spike_in': None}
+        self.reset(area_rect, initial_pos)
+
+    def reset(self, area_rect, initial_pos):
+        super().reset(area_rect, initial_pos)
+        self.speedy = 0
         self.collided = False
+        self.static_y = True
+        self.frozen = None
+
+    def unwire(self):
+        super().unwire()
+        self.callbacks['spike_out'] = None
+        self.callbacks['spike_in'] = None
+
+    @property
+    def image(self):
+        #a falling platform keeps the frame it was hit on
+        if self.frozen is None: return self.clock.current_frame
+        return self.frozen
 
     def handle_collision(self):
-        r = random.random()
-        if r > 0.9 and self.callbacks['spike_out']:
+        if self.roll > 0.9 and self.callbacks['spike_out']:
             self.callbacks['spike_out']()
         else:
             self.callbacks['spike_in']()
         self.collided = True
+        self.static_y = False
+        self.frozen = self.clock.current_frame
 
-    def update(self):
+    def update(self, dt=1/TICK_RATE):
+        step = dt * TICK_RATE
         if not self.collided:
-            self.rect.centerx += self.speedx
+            self.move_to((self.pos.x + self.speedx * step, self.pos.y))
             super().collide_with_walls()
-            self.image = self.animation.next_frame()
         else:
-            self.speedy += GRAVITY
-            self.rect.centerx += self.speedx
-            self.rect.centery += self.speedy
+            self.speedy += GRAVITY * step
+            self.move_to((self.pos.x + self.speedx * step, self.pos.y + self.speedy * step))
 
 class CloudPlatorm(Platform):
-    def __init__(self, initial_pos, listener=None, *groups):
-        super().__init__(listener, *groups)
+    one_shot = True
+
+    def __init__(self, initial_pos, *groups):
+        super().__init__(*groups)
 
-        self.animation = Animation(cloud_platform, 0.08)
+        self.animation = Animation(assets['cloud'], 0.08)
 
         self.image = self.animation.current_frame
         self.rect = self.image.get_rect()
 
+        self.reset(initial_pos)
+
+    def reset(self, initial_pos):
+        super().reset()
+        self.animation.reset()
+        self.image = self.animation.current_frame
         self.rect.bottomleft = initial_pos
 
         self.collided = False
@@ -242,22 +389,31 @@ class CloudPlatorm(Platform):
         if not self.collided:
             self.collided = True
 
-    def update(self):
-        
-        if self.collided:
-            if self.animation.frame_index < len(self.animation.frames)-1: 
-                self.image = self.animation.next_frame()
-            else: self.kill()
+    def animate(self, step):
+        if not self.collided: return False
+        if self.animation.frame_index < len(self.animation.frames)-1:
+            self.image = self.animation.next_frame(step)
+            return True
+        self.kill()
+        return False
 
 class BoucePlatform(Platform):
+    one_shot = True
+
     def __init__(self, initial_pos,*groups):
         super().__init__( *groups)
 
-        self.animation = Animation(bounce_platform, 0.02)
+        self.animation = Animation(assets['bounce'], 0.02)
 
         self.image = self.animation.current_frame
         self.rect = self.image.get_rect()
 
+        self.reset(initial_pos)
+
+    def reset(self, initial_pos):
+        super().reset()
+        self.animation.reset()
+        self.image = self.animation.current_frame
         self.rect.bottomleft = initial_pos
 
         self.collided = False
@@ -266,215 +422,552 @@ class BoucePlatform(Platform):
         super().handle_collision()
         self.collided = True
 
-    def update(self):
-        if self.collided:
-            self.image = self.animation.next_frame()
-            if self.animation.frame_index > len(self.animation.frames):
-                self.collided = False
+    def animate(self, step):
+        if not self.collided: return False
+        frame_index = self.animation.frame_index
+        self.image = self.animation.next_frame(step)
+        #the spring plays once per bounce and rests on its first frame
+        if self.animation.frame_index < frame_index:
+            self.animation.reset()
+            self.image = self.animation.current_frame
+            self.collided = False
+        return self.collided
 
 class Hat(Platform):
+    clock = LazyAnimation(assets['hat'], 0.05)
 
     def __init__(self, pos, *groups):
         super().__init__(*groups)  
-        self.animation = Animation(hat_animation, 0.05)
-        self.image = self.animation.current_frame
         self.rect = self.image.get_rect()
+        self.reset(pos)
+
+    @property
+    def image(self):
+        return self.clock.current_frame
+
+    def reset(self, pos):
+        super().reset()
         self.rect.center = pos
-    
-    def update(self):
-        self.image = self.animation.next_frame()
+
+    def unwire(self):
+        super().unwire()
+        self.carrier = None
 
     def handle_collision(self):
         super().handle_collision()
         self.kill()
 
-class PlatformGroup(pygame.sprite.Group):
-
-
-    def move(self, offset):
-        for sprite in self.sprites():
-            sprite.rect.y += offset
-
-
-
-class Game:
+#indexed by the difficulty a platform is rolled at, hats come last
+PLATFORM_TYPES = (BoucePlatform, StillPlatform, MovingPlatform, BreakablePlatform, CloudPlatorm, SpikeMovingPlatform, Hat)
+PLATFORM_SHEETS = ('bounce', 'still', 'moving', 'break', 'cloud', 'spike', 'hat')
+
+#camera, score, tier (-1 before the first), end position, level position, order counter, clock frames,
+#player position, previous position, speed, rect, rect at the last collision check, boosting, boost and falling time,
+#image, hat center, platform count
+GAME_STATE = struct.Struct('<ddIiddQIdddddddddiiiiBddBiiH')
+#order, kind, flags, position (the float center of moving platforms, the rect's top left of the rest), speeds,
+#one-shot animation frame, spike roll, order of the carried hat, frozen frame
+PLATFORM_STATE = struct.Struct('<IBBddddddIB')
+COLLIDED, FALLING, LETHAL, PLAYING = 1, 2, 4, 8
+NO_FRAME = 255
+
+class PlatformPool:
+    def __init__(self):
+        self.free = {}
+        self.created = collections.Counter()
+        self.reused = collections.Counter()
+
+    def acquire(self, platform_type, groups, *args):
+        free = self.free.get(platform_type)
+        if free:
+            platform = free.pop()
+            platform.reset(*args)
+            self.reused[platform_type] += 1
+        else:
+            platform = platform_type(*args)
+            platform.pool = self
+            self.created[platform_type] += 1
+        platform.add(*groups)
+        return platform
+
+    def release(self, platform):
+        #a free platform keeps nothing of the game it came from alive
+        platform.unwire()
+        self.free.setdefault(type(platform), []).append(platform)
+
+    def clear(self):
+        for free in self.free.values():
+            for platform in free: platform.pool = None
+        self.free.clear()
+
+    def reserve(self, platform_type, count, *args):
+        free = self.free.setdefault(platform_type, [])
+        while len(free) < count:
+            platform = platform_type(*args)
+            platform.pool = self
+            self.created[platform_type] += 1
+            free.append(platform)
+
+def sprite_top(sprite):
+    return sprite.rect.y
+
+def sweep_time(start, end, rect):
+    #when, from 0 to 1, a rect moving from start to end lands on rect's top edge, 1 for a plain overlap at the end
+    if start.bottom <= rect.top < end.bottom:
+        t = (rect.top - start.bottom) / (end.bottom - start.bottom)
+        x = start.x + (end.x - start.x) * t
+        if x < rect.right and x + end.width > rect.left: return t
+    if end.colliderect(rect): return 1.0
+    return None
 
-    def __init__(self, window_rect):
+class PlatformGroup(pygame.sprite.Group):
+    #static platforms are kept sorted by their world rect.y, topmost first
+    def __init__(self, *sprites):
+        self.by_height = []
+        self.pending = []
+        self.loose = {}
+        self.order = {}
+        self.counter = 0
+        self.max_height = 0
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.counter += 1
+        self.order[sprite] = self.counter
+        #rects are assigned after Sprite.__init__ adds the sprite, so indexing waits for the next query
+        if sprite.static_y: self.pending.append(sprite)
+        else: self.loose[sprite] = None
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        del self.order[sprite]
+        if sprite in self.loose: del self.loose[sprite]
+        else: self.unindex(sprite)
+
+    def unindex(self, sprite):
+        if sprite in self.pending: self.pending.remove(sprite)
+        else:
+            i = bisect.bisect_left(self.by_height, sprite.rect.y, key=sprite_top)
+            while self.by_height[i] is not sprite: i += 1
+            del self.by_height[i]
+
+    def release(self, sprite):
+        #the sprite is about to move vertically on its own, check it linearly from now on
+        if sprite in self.loose: return
+        self.unindex(sprite)
+        self.loose[sprite] = None
+
+    def flush(self):
+        if not self.pending: return
+        if len(self.pending) > 8 and len(self.pending) > len(self.by_height) // 8:
+            self.by_height += self.pending
+            self.by_height.sort(key=sprite_top)
+        else:
+            for sprite in self.pending: bisect.insort(self.by_height, sprite, key=sprite_top)
+        self.max_height = max(self.max_height, max(sprite.rect.height for sprite in self.pending))
+        self.pending.clear()
+
+    def collide(self, rect):
+        self.flush()
+        lo = bisect.bisect_right(self.by_height, rect.top - self.max_height, key=sprite_top)
+        hi = bisect.bisect_left(self.by_height, rect.bottom, key=sprite_top)
+
+        #same answer as spritecollideany: the earliest added sprite wins
+        collided = None
+        for sprite in self.by_height[lo:hi]:
+            if rect.colliderect(sprite.rect) and (collided is None or self.order[sprite] < self.order[collided]):
+                collided = sprite
+        for sprite in self.loose:
+            if rect.colliderect(sprite.rect) and (collided is None or self.order[sprite] < self.order[collided]):
+                collided = sprite
+        return collided
+
+    def sweep(self, start, end):
+        #the sprite met first by a rect moving from start to end, and when, ties go to the earliest added
+        self.flush()
+        lo = bisect.bisect_right(self.by_height, min(start.top, end.top) - self.max_height, key=sprite_top)
+        hi = bisect.bisect_left(self.by_height, max(start.bottom, end.bottom), key=sprite_top)
+
+        collided, contact = None, None
+        for sprites in (self.by_height[lo:hi], self.loose):
+            for sprite in sprites:
+                t = sweep_time(start, end, sprite.rect)
+                if t is None: continue
+                if collided is None or t < contact or (t == contact and self.order[sprite] < self.order[collided]):
+                    collided, contact = sprite, t
+        return collided, contact
+
+    def below(self, y):
+        self.flush()
+        i = bisect.bisect_left(self.by_height, y, key=sprite_top)
+        return self.by_height[i:] + [sprite for sprite in self.loose if sprite.rect.y >= y]
+
+
+
+class Game(Scene):
+
+    def __init__(self, window_rect, input_source=keyboard_input, dirty_rects=DIRTY_RECTS, pool=None, seed=None):
+
+        #every random decision of a run comes from the seed, so a seed and the inputs reproduce it
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        #platforms are rolled ahead of the camera from their own stream on a worker thread
+        self.level = LevelStream(self.seed, functools.partial(roll_platform, width=window_rect.width))
 
         self.window_rect = window_rect
-
+        self.input_source = input_source
+        #a pool passed in outlives the game and gets its platforms back on dispose, an own one is emptied
+        self.shared_pool = pool is not None
+        self.pool = pool or PlatformPool()
+        self.profiler = profiler
+
+        #platforms live in world coordinates, the player and its hat in screen coordinates
+        self.camera_y = 0
+        self.previous_camera_y = 0
+
+        self.dirty_rects = dirty_rects
+        self.drawn_rects = []
+        self.drawn_view = None
         self.visible_sprites = pygame.sprite.Group()
         self.platforms = PlatformGroup()
         self.player = pygame.sprite.GroupSingle()
+        self.platform_groups = [self.platforms, self.visible_sprites]
+        self.animations = AnimationSystem({platform_type: (platform_type.clock.frames, platform_type.clock.frame_speed)
+                                           for platform_type in (MovingPlatform, SpikeMovingPlatform, Hat)})
 
-        self.dist = {0: 0.4, 1: 0.3, 2: 0.1, 3:0.05, 4: 0.025, 5: 0.025}
-        self.weights = {0: 20, 1: 15, 2: 10, 3:5, 4: 4, 5: 1}
+        self.dist = dict(START_DIST)
+        self.weights = dict(START_WEIGHTS)
+        self.sampler = AliasTable(FIRST_SCREEN_DIST)
+        self.tier = None
 
         self.callback = None
+        self.state = bytearray()
 
         self.add_sprites()
+        #where the player was at the last collision check, in world coordinates, and when in the last tick it landed
+        self.previous_rect = self.player_world_rect()
+        self.contact_time = None
 
         self.update_high_score_callback = None
         self.score = 0
 
     def add_sprites(self):
-        Player(self.window_rect, [self.player, self.visible_sprites])
+        Player(self.window_rect, [self.player, self.visible_sprites], input_source=self.input_source)
 
-        self.end_pos = pygame.math.Vector2((random.randrange(0, self.window_rect.width-PLATFORM_SIZE[0]), 
+        self.end_pos = pygame.math.Vector2((self.rng.randrange(0, self.window_rect.width-PLATFORM_SIZE[0]), 
                                             self.window_rect.bottom))
 
         for i in range(N_PLATFORMS):
             self.add_single_platform()
 
     def add_single_platform(self):
-        self.create_new_platform()
-        self.end_pos.x = random.randrange(0, self.window_rect.width-PLATFORM_SIZE[0])
+        u, has_hat, next_x, roll = self.level.next()
+        self.create_new_platform(self.sampler.pick(u), has_hat, roll)
+        self.end_pos.x = next_x
         self.end_pos.y -= PLATFORM_SPACING
 
-    def create_new_platform(self):
-        o = outcome(self.dist)
-        r = random.random()
-
-        if  o == 1:
-            p = StillPlatform(self.end_pos, [self.platforms, self.visible_sprites])
-            p.callbacks.append(self.player.sprite.jump)
-            if r > 0.9:
-                posx, posy = p.rect.center
-                posy  -= 10
-                p = Hat((posx, posy), [self.platforms, self.visible_sprites])
-                p.callbacks.append(self.add_player_hat)
-                p.callbacks.append(self.player.sprite.boost)
-
-        elif o == 5:
-            p = SpikeMovingPlatform(self.window_rect, self.end_pos, [self.platforms, self.visible_sprites])
-            p.callbacks['spike_in'] = self.player.sprite.jump
-            p.callbacks['spike_out'] = self.callback
-        elif o == 3:
-            p = BreakablePlatform(self.end_pos, [self.platforms, self.visible_sprites])
-            p.callbacks.append(self.player.sprite.jump)
-            p.callbacks.append(self.add_single_platform)
-        elif o == 4:
-            p = CloudPlatorm(self.end_pos, [self.platforms, self.visible_sprites])
-            p.callbacks.append(self.add_single_platform)
-        elif o == 0:
-            p = BoucePlatform(self.end_pos,  [self.platforms, self.visible_sprites])
-            p.callbacks.append(self.player.sprite.big_jump)
-        else:
-            p = MovingPlatform(self.window_rect, self.end_pos,  [self.platforms, self.visible_sprites])
-            p.callbacks.append(self.player.sprite.jump)
-            if r > 0.9:
-                posx, posy = p.rect.center
-                posy  -= 10
-                h = Hat((posx, posy), [self.platforms, self.visible_sprites])
-                h.callbacks.append(self.add_player_hat)
-                h.callbacks.append(self.player.sprite.boost)
+    def create_new_platform(self, o, has_hat, roll=0.0):
+        p = self.spawn(PLATFORM_TYPES[o], self.end_pos)
+        if o == 5: p.roll = roll
+        if has_hat and o in (1, 2):
+            posx, posy = p.rect.center
+            posy  -= 10
+            h = self.spawn(Hat, (posx, posy))
+            if o == 2:
+                h.carrier = p
                 p.hat = h
 
+    def spawn(self, platform_type, pos, groups=None):
+        args = (self.window_rect, pos) if issubclass(platform_type, MovingPlatform) else (pos,)
+        p = self.acquire(platform_type, self.platform_groups if groups is None else groups, *args)
+        self.wire(p)
+        return p
+
+    def wire(self, p):
+        player = self.player.sprite
+        platform_type = type(p)
+        if platform_type is SpikeMovingPlatform:
+            p.callbacks['spike_in'] = player.jump
+            p.callbacks['spike_out'] = self.callback
+        elif platform_type is Hat: p.callbacks += (self.add_player_hat, player.boost)
+        elif platform_type is BreakablePlatform: p.callbacks += (player.jump, self.add_single_platform)
+        elif platform_type is CloudPlatorm: p.callbacks.append(self.add_single_platform)
+        elif platform_type is BoucePlatform: p.callbacks.append(player.big_jump)
+        else: p.callbacks.append(player.jump)
+
+    def acquire(self, platform_type, groups, *args):
+        platform = self.pool.acquire(platform_type, groups, *args)
+        clock = self.animations.clocks.get(platform_type)
+        if clock: platform.clock = clock
+        return platform
+
     def handle_click(self, event):pass
 
+    def exit(self):
+        super().exit()
+        self.update_high_score_callback = None
+
+    def dispose(self):
+        #the level worker stops now instead of whenever the game happens to be collected
+        self.level.close()
+        #platforms go back to the pool unwired and every group is emptied, so nothing is left in a cycle
+        player = self.player.sprite
+        for sprite in self.visible_sprites.sprites():
+            if sprite is not player: sprite.kill()
+        for group in (self.player, self.visible_sprites, self.platforms): group.empty()
+        player.hat = None
+        if not self.shared_pool: self.pool.clear()
+        self.callback = self.update_high_score_callback = None
+
     def update(self, dt):
-        self.visible_sprites.update()
+        profiler = self.profiler
+        self.previous_camera_y = self.camera_y
+        self.visible_sprites.update(dt)
+        self.animations.update(dt * TICK_RATE)
+        if profiler.enabled: profiler.lap(SPRITES)
 
         self.check_collision()
+        if profiler.enabled: profiler.lap(COLLISION)
 
-        self.check_vertical_scroll()
+        self.check_vertical_scroll(dt)
+        if profiler.enabled: profiler.lap(SCROLL)
 
         self.manage_platforms()
+        if profiler.enabled: profiler.lap(PLATFORMS)
 
         self.update_distribution()
+        if profiler.enabled: profiler.lap(DISTRIBUTION)
 
         self.check_player_death()
 
     def check_collision(self):
-        collided = pygame.sprite.spritecollideany(self.player.sprite, self.platforms)
+        #the player is swept from where the last check saw it, so no step is long enough to pass through a platform
+        rect = self.player_world_rect()
+        start = self.previous_rect
+        self.previous_rect = rect
+        #wrapping around the screen edge is a jump, not motion to sweep
+        if abs(rect.x - start.x) > self.window_rect.width / 2: start = start.move(rect.x - start.x, 0)
+
+        collided, contact = self.platforms.sweep(start, rect)
+        self.contact_time = None
         if collided and self.player.sprite.speed.y > 0:
+            self.contact_time = contact
             #self.player.sprite.rect.bottom = collided.rect.top
             collided.handle_collision()
+            if collided.one_shot: self.animations.play(collided)
+            if not collided.static_y: self.platforms.release(collided)
     
     def reposition_player(self, platform):
-        self.player.sprite.rect.bottom = platform.rect.top
+        self.player.sprite.rect.bottom = platform.rect.top - self.view_offset()
 
+    def view_offset(self):
+        return round(self.camera_y)
 
-    def check_vertical_scroll(self):
+    def player_world_rect(self):
+        return self.player.sprite.rect.move(0, self.view_offset())
+
+
+    def check_vertical_scroll(self, dt=1/TICK_RATE):
         player_pos = self.player.sprite.pos
-        offset = -self.player.sprite.speed.y
+        offset = -self.player.sprite.speed.y * dt * TICK_RATE
         if player_pos.y < MIN_PLAYER_Y:
             self.player.sprite.pos.y = MIN_PLAYER_Y
-            self.platforms.move(offset)
-            self.end_pos.y += offset
+            self.camera_y -= offset
             self.score += SCORE_UPDATE
-            self.update_high_score_callback(self.score)
+            if self.update_high_score_callback: self.update_high_score_callback(self.score)
         elif player_pos.y > MAX_PLAYER_Y:
             self.player.sprite.pos.y = MAX_PLAYER_Y
-            self.platforms.move(offset)
-            self.end_pos.y += offset
+            self.camera_y -= offset
 
     def check_player_death(self):
         if self.player.sprite.falling_time > 150  and self.callback:
             self.callback()
 
     def manage_platforms(self):
-        for platform in self.platforms.sprites():
-            if platform.rect.y >= self.window_rect.bottom:
-                platform.kill()
-                self.add_single_platform()
+        for platform in self.platforms.below(self.window_rect.bottom + self.view_offset()):
+            platform.kill()
+            self.add_single_platform()
 
     def update_distribution(self):
-        if not self.score % 500:
-            for difficulty in self.weights:
-                increase = self.score/500 * difficulty
-                self.weights[difficulty] += increase
-
-            self.dist = normalize(self.weights)
+        #the sampler is only rebuilt when the score enters a new difficulty tier
+        tier = self.score // DIFFICULTY_STEP
+        if tier != self.tier: self.set_tier(tier)
+
+    def set_tier(self, tier):
+        self.tier = tier
+        if tier is None:
+            self.weights = dict(START_WEIGHTS)
+            self.sampler = AliasTable(FIRST_SCREEN_DIST)
+            self.dist = dict(START_DIST)
+            return
+        self.weights = tier_weights(tier)
+        self.sampler = AliasTable(self.weights)
+        self.dist = self.sampler.dist
 
     def add_player_hat(self):
-        self.player.sprite.hat = Hat((0,0), [self.visible_sprites])
-
-    def draw(self, screen):
-        screen.fill('white')
-        self.visible_sprites.draw(screen)
-
-class InitialMenu:
-    def __init__(self, window_rect):
+        self.player.sprite.hat = self.acquire(Hat, [self.visible_sprites], (0,0))
+
+    def save_state(self):
+        #everything the next ticks depend on, packed into a reused buffer, the view is only valid until the next call
+        player = self.player.sprite
+        order = self.platforms.order
+        size = GAME_STATE.size + len(order) * PLATFORM_STATE.size
+        if len(self.state) < size: self.state = bytearray(size * 2)
+
+        image = (player.facing_left, player.facing_right, player.facing_front).index(player.image)
+        GAME_STATE.pack_into(self.state, 0, self.camera_y, self.previous_camera_y, self.score,
+                             -1 if self.tier is None else self.tier, *self.end_pos, self.level.tell(),
+                             self.platforms.counter, *(clock.frame_index for clock in self.animations.clocks.values()),
+                             *player.pos, *player.previous_pos, *player.speed, *player.rect.topleft,
+                             *self.previous_rect.topleft, player.is_boosting, player.time_boosting,
+                             player.falling_time, image,
+                             *(player.hat.rect.center if player.is_boosting else (0, 0)), len(order))
+
+        offset = GAME_STATE.size
+        playing = self.animations.active
+        for p, n in order.items():
+            animation = getattr(p, 'animation', None)
+            hat = getattr(p, 'hat', None)
+            frozen = getattr(p, 'frozen', None)
+            x, y = getattr(p, 'pos', p.rect.topleft)
+            flags = ((COLLIDED if getattr(p, 'collided', False) else 0) | (0 if p.static_y else FALLING)
+                     | (LETHAL if type(p) is SpikeMovingPlatform and p.callbacks['spike_out'] else 0)
+                     | (PLAYING if p in playing else 0))
+            PLATFORM_STATE.pack_into(self.state, offset, n, PLATFORM_TYPES.index(type(p)), flags, x, y,
+                                     getattr(p, 'speedx', 0), getattr(p, 'speedy', 0),
+                                     animation.frame_index if animation else 0, getattr(p, 'roll', 0.0),
+                                     order[hat] if hat and hat.carrier is p and hat in order else 0,
+                                     NO_FRAME if frozen is None else p.clock.frames.index(frozen))
+            offset += PLATFORM_STATE.size
+        return memoryview(self.state)[:size]
+
+    def load_state(self, data):
+        (self.camera_y, self.previous_camera_y, self.score, tier, end_x, end_y, position, counter, *frames,
+         px, py, previous_x, previous_y, speed_x, speed_y, rect_x, rect_y, checked_x, checked_y,
+         boosting, time_boosting, falling_time, image, hat_x, hat_y, count) = GAME_STATE.unpack_from(data)
+
+        player = self.player.sprite
+        for sprite in self.visible_sprites.sprites():
+            if sprite is not player: sprite.kill()
+        self.animations.active.clear()
+        for clock, frame in zip(self.animations.clocks.values(), frames): clock.seek(frame)
+
+        tier = None if tier < 0 else tier
+        if tier != self.tier: self.set_tier(tier)
+        self.end_pos.update(end_x, end_y)
+        self.level.seek(position)
+
+        player.pos.update(px, py)
+        player.previous_pos.update(previous_x, previous_y)
+        player.speed.update(speed_x, speed_y)
+        #scrolling clamps the position after the rect has followed it, so the rect is kept as it was
+        player.rect.topleft = rect_x, rect_y
+        self.previous_rect = player.rect.copy()
+        self.previous_rect.topleft = checked_x, checked_y
+        player.is_boosting = bool(boosting)
+        player.time_boosting = time_boosting
+        player.falling_time = falling_time
+        player.image = (player.facing_left, player.facing_right, player.facing_front)[image]
+        if player.is_boosting:
+            self.add_player_hat()
+            player.hat.rect.center = hat_x, hat_y
+
+        #platforms come back through the pool in their original order, with the callbacks a new one would get
+        order = self.platforms.order
+        hats, carriers = {}, []
+        records = data[GAME_STATE.size:GAME_STATE.size + count * PLATFORM_STATE.size]
+        for n, kind, flags, x, y, speedx, speedy, frame, roll, hat, frozen in PLATFORM_STATE.iter_unpack(records):
+            platform_type = PLATFORM_TYPES[kind]
+            p = self.spawn(platform_type, (x, y), [])
+            if hasattr(p, 'pos'): p.move_to((x, y))
+            else: p.rect.topleft = x, y
+            if platform_type is SpikeMovingPlatform:
+                p.speedy = speedy
+                p.roll = roll
+                p.static_y = not flags & FALLING
+                if not flags & LETHAL: p.callbacks['spike_out'] = None
+                if frozen != NO_FRAME: p.frozen = p.clock.frames[frozen]
+            if hasattr(p, 'speedx'): p.speedx = speedx
+            if hasattr(p, 'collided'): p.collided = bool(flags & COLLIDED)
+            if hasattr(p, 'animation'): p.image = p.animation.seek(frame)
+
+            p.add(*self.platform_groups)
+            order[p] = n
+            if flags & PLAYING: self.animations.play(p)
+            if platform_type is Hat: hats[n] = p
+            elif hat: carriers.append((p, hat))
+
+        for p, n in carriers:
+            p.hat = hats[n]
+            p.hat.carrier = p
+        self.platforms.counter = counter
+        self.drawn_view = None
+
+    def draw(self, screen, alpha=1):
+        view = round(self.previous_camera_y + (self.camera_y - self.previous_camera_y) * alpha)
+
+        #the player and its hat are drawn where the player is between the last two ticks
+        player = self.player.sprite
+        player_rect = player.render_rect(alpha)
+        shift = player_rect.x - player.rect.x, player_rect.y - player.rect.y
+
+        blits = [(sprite.image, sprite.rect.move(0, -view) if sprite in self.platforms else sprite.rect.move(shift))
+                    for sprite in self.visible_sprites]
+
+        if not self.dirty_rects or view != self.drawn_view:
+            screen.fill('white')
+            self.drawn_rects = screen.blits(blits, self.dirty_rects)
+            self.drawn_view = view
+            return None
+
+        for rect in self.drawn_rects: screen.fill('white', rect)
+        dirty = self.drawn_rects
+        self.drawn_rects = screen.blits(blits)
+        return dirty + self.drawn_rects
+
+class InitialMenu(Scene):
+    def __init__(self, window_rect, input_source=keyboard_input):
         self.window_rect = window_rect
-        self.player = Player(self.window_rect)
+        self.player = Player(self.window_rect, input_source=input_source)
         self.banner = pygame.Surface((self.window_rect.width, 35))
         self.banner_rect = self.banner.get_rect()
+        self.banner_rect.bottomleft = self.window_rect.bottomleft
         self.banner.fill('black')
-        self.text = pygame.font.SysFont('Arial', 30, True).render('START', True, 'white')
+        self.text = text_cache.render('START', 'white')
 
-        self.player.pos = self.window_rect.center
+        #the player stands on the banner instead of bouncing, so nothing on this screen moves and it is drawn once
+        self.player.rect.midbottom = self.banner_rect.midtop
+        self.player.pos.update(self.player.rect.center)
 
         self.callback = None
+        self.dirty = True
 
     def draw_banner(self, screen):
-        self.banner_rect.bottomleft = self.window_rect.bottomleft
         screen.blit(self.banner, self.banner_rect)
 
         text_rect = self.text.get_rect()
         text_rect.center = self.banner_rect.center
         screen.blit(self.text, text_rect)
 
-    def update(self, dt):
-        self.player.update()
-        if self.player.rect.colliderect(self.banner_rect): self.player.jump()
+    def update(self, dt):pass
 
-    def draw(self, screen):
+    def draw(self, screen, alpha=1):
         screen.fill('white')
         self.draw_banner(screen)
-        screen.blit(screen, self.player.rect, self.player.rect)
         screen.blit(self.player.image, self.player.rect)
+        self.dirty = False
 
     def handle_click(self, event):
         
-        if self.banner_rect.collidepoint(pygame.mouse.get_pos()) and self.callback:
+        if self.banner_rect.collidepoint(event.pos) and self.callback:
             self.callback()
 
 
-class GameOverMenu:
+class GameOverMenu(Scene):
     def __init__(self, window_rect):
         self.window_rect = window_rect
-        self.text = pygame.font.SysFont('Arial', 30, True).render('GAME OVER', True, 'black')
+        self.text = text_cache.render('GAME OVER', 'black')
         self.text_rect = self.text.get_rect()
         self.text_rect.center = window_rect.center
         self.text_rect.centery -= 100
@@ -486,36 +979,62 @@ class GameOverMenu:
         self.restart_button.fill('black')
 
         self.callback = None
+        #nothing on this screen moves, it is drawn once
+        self.dirty = True
 
     def update(self, dt):pass
 
-    def draw(self, screen):
+    def draw(self, screen, alpha=1):
         screen.fill('white')
         screen.blit(self.text, self.text_rect)
         screen.blit(self.restart_button, self.restart_rect)
+        self.dirty = False
 
     def handle_click(self, event):
         
-        if self.restart_rect.collidepoint(pygame.mouse.get_pos()) and self.callback:
+        if self.restart_rect.collidepoint(event.pos) and self.callback:
             self.callback()
 
 
         
 class GameManager:
-    def __init__(self, window_rect):
+    def __init__(self, window_rect, input_source=keyboard_input, dirty_rects=DIRTY_RECTS, replay_dir=REPLAY_DIR,
+                 score_store=None, spectator=None, practice=PRACTICE_MODE, rewind_input=rewind_input, tracker=None):
         self.window_rect = window_rect
-        self.current_scene = InitialMenu(self.window_rect)
+        self.input_source = input_source
+        self.dirty_rects = dirty_rects
+        self.replay_dir = replay_dir
+        self.recorder = None
+        self.ended_game = None
+        self.tracker = tracker
+        self.current_scene = InitialMenu(self.window_rect, self.input_source)
         self.current_scene.callback = self.on_start
+        self.current_scene.enter()
 
         self.top_banner = pygame.Surface((self.window_rect.width, 30))
         self.top_banner.fill('white')
         self.top_banner_rect = self.top_banner.get_rect()
 
         self.is_playing = False
+        self.score_text = score_counter()
+
+        self.score_store = score_store or ScoreStore()
+        self.high_score = self.score_store.high_score
+        self.started_at = 0
+        self.spectator = spectator
+
+        self.practice = practice
+        self.rewind_input = rewind_input
+        self.rewind = RewindBuffer(REWIND_SECONDS * TICK_RATE) if practice else None
+        self.frozen = False
+
+    @property
+    def dirty(self):
+        return self.is_playing or getattr(self.current_scene, 'dirty', True)
 
-        f = open('./assets/high_score.txt', 'r')
-        self.high_score = int(f.readline())
-        f.close()
+    @property
+    def mode(self):
+        return 'gameplay' if self.is_playing else 'menu'
 
     def update_high_score(self, new_score):
         if new_score > self.high_score: self.high_score = new_score
@@ -526,41 +1045,86 @@ class GameManager:
         elif event.key == pygame.K_i and self.is_playing:
             print(self.current_scene.dist)
 
+    def switch(self, scene, callback):
+        #a replaced scene is disposed of right away, except a finished game, which goes once its run is saved
+        old = self.current_scene
+        old.exit()
+        if old is not self.ended_game: old.dispose()
+        scene.callback = callback
+        self.current_scene = scene
+        scene.enter()
+        if self.tracker: self.tracker.switch(old, scene)
+
     def on_start(self):
-        self.current_scene = Game(self.window_rect)
-        self.current_scene.callback = self.on_player_death
-        self.current_scene.update_high_score_callback = self.update_high_score
+        input_source = self.input_source
+        if self.replay_dir and not self.practice: input_source = self.recorder = Recorder(self.input_source)
+
+        game = Game(self.window_rect, input_source, self.dirty_rects)
+        #rewound runs don't count for scores
+        if not self.practice: game.update_high_score_callback = self.update_high_score
+        self.switch(game, self.on_practice_death if self.practice else self.on_player_death)
+        if self.rewind is not None: self.rewind.clear()
+        self.frozen = False
         self.is_playing = True
+        self.started_at = time.time()
 
     def on_player_death(self):
-        self.current_scene = GameOverMenu(self.window_rect)
-        self.current_scene.callback = self.on_start
+        if self.is_playing: self.ended_game = self.current_scene
+        self.switch(GameOverMenu(self.window_rect), self.on_start)
         self.is_playing = False
 
-        f = open('./assets/high_score.txt', 'w')
-        f.write(str(self.high_score))
-        f.close()
+    def on_practice_death(self):
+        #the run waits on the tick it was lost until it is rewound
+        self.frozen = True
 
     def update(self, dt):
-        self.current_scene.update(dt)
-
-    def draw(self, screen):
-        self.current_scene.draw(screen)
+        if self.rewind is not None and self.is_playing and self.rewind_input():
+            state = self.rewind.pop()
+            if state is not None:
+                self.current_scene.load_state(state)
+                self.frozen = False
+        elif not self.frozen:
+            self.current_scene.update(dt)
+            if self.rewind is not None and self.is_playing: self.rewind.push(self.current_scene.save_state())
+        if self.spectator and self.is_playing: self.spectator.publish(self.current_scene)
+
+        #the run is saved once its last tick has finished
+        if self.ended_game:
+            game = self.ended_game
+            self.score_store.submit(game.score, seed=game.seed, duration=time.time() - self.started_at)
+            if self.recorder: self.save_replay(self.ended_game, dt)
+            self.ended_game = None
+            game.dispose()
+
+    def save_replay(self, game, dt):
+        replay = Replay.from_game(game, self.recorder, round(1/dt), len(self.recorder.actions) - 1)
+        #the replay holds a copy of the actions, so it is encoded and written on the score store's thread
+        filename = os.path.join(self.replay_dir, '%s-%d.wbr' % (time.strftime('%Y%m%d-%H%M%S'), game.seed))
+        self.score_store.put(lambda: save_file(filename, replay.encode()))
+
+    def draw(self, screen, alpha=1):
+        rects = self.current_scene.draw(screen, alpha)
         if self.is_playing:
-            text_surf = pygame.font.SysFont('Arial', 30, True)\
-                            .render('%s HI: %s'%(self.current_scene.score, self.high_score), True, 'black')
-            
+            text_surf = self.score_text.render(self.current_scene.score, self.high_score)
+
             screen.blit(self.top_banner, (0,0))
-            screen.blit(text_surf, (0,0))
+            text_rect = screen.blit(text_surf, (0,0))
+            if rects is not None: rects += [self.top_banner_rect, text_rect]
+        return rects
 
     def handle_click(self, event):
         self.current_scene.handle_click(event)
 
 
 if __name__ == '__main__':
-    engine = Engine(WINDOW_SIZE)
+    engine = Engine(WINDOW_SIZE, scale=WINDOW_SCALE, scale_mode=SCALE_MODE, pipelined=PIPELINED)
     # engine.scene = Game(engine.window_rect)
-    engine.scene = GameManager(engine.window_rect)
+    spectator = None
+    if SPECTATOR_PORT:
+        from spectator import SpectatorServer
+        spectator = SpectatorServer(port=SPECTATOR_PORT).start()
+    tracker = SceneTracker(log=lambda record: print(format_switch(record))) if TRACK_SCENES else None
+    engine.scene = GameManager(engine.window_rect, spectator=spectator, tracker=tracker)
 
     engine.event_system.subscribe(engine.scene.handle_click, pygame.MOUSEBUTTONDOWN)
     engine.event_system.subscribe(engine.scene.on_press, pygame.KEYDOWN)